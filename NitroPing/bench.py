@@ -0,0 +1,571 @@
+# bench.py
+"""Offline benchmarks for NitroPing (no Discord connection needed).
+
+    python bench.py memory --members 500000 --boosters 0.02
+    python bench.py replay storm --guilds 200 --events 50
+    python bench.py replay startup --guilds 10000 --save startup.jsonl
+    python bench.py replay --load startup.jsonl --low-memory
+    python bench.py topgg --votes 5000
+    python bench.py topgg --url http://127.0.0.1:5000/topgg --auth changeme
+
+Each scenario runs against the real bot module; results are printed as a small table.
+"""
+import os
+import sys
+import gc
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import resource
+from collections import Counter
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+BASE_PATH = Path(__file__).resolve().parent
+GUILD_ID = 900000000000000000
+USER_ID_BASE = 100000000000000000
+CHANNEL_ID_BASE = 700000000000000000
+ROLE_ID_BASE = 600000000000000000
+BOT_USER_ID = 1411081092689166460
+
+def rss_mb() -> float:
+    """Current resident set size in MiB (falls back to peak RSS off Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def guild_payload(guild_id: int, member_count: int) -> dict:
+    everyone = {"id": str(guild_id), "name": "@everyone", "permissions": "0", "position": 0,
+                "color": 0, "hoist": False, "managed": False, "mentionable": False}
+    return {"id": str(guild_id), "name": "Synthetic", "member_count": member_count, "roles": [everyone],
+            "emojis": [], "stickers": [], "channels": [], "threads": [], "features": [],
+            "premium_tier": 3, "premium_subscription_count": 0, "large": True}
+
+def member_payload(guild_id: int, user_id: int, premium_since: datetime | None, roles: list[int] = ()) -> dict:
+    return {
+        "guild_id": str(guild_id),
+        "user": {"id": str(user_id), "username": f"user{user_id % 10_000_000}", "discriminator": "0",
+                 "global_name": None, "avatar": None},
+        "roles": [str(r) for r in roles], "nick": None, "joined_at": "2023-01-01T00:00:00+00:00",
+        "premium_since": premium_since.isoformat() if premium_since else None,
+        "deaf": False, "mute": False, "flags": 0,
+    }
+
+# --------------------------------------------------------------------------------------
+# memory: RSS of the member cache for one large synthetic guild
+# --------------------------------------------------------------------------------------
+def memory_worker(members: int, booster_ratio: float) -> dict:
+    import bot as nitroping
+    import discord
+
+    client = nitroping.bot
+    state = client._connection
+    gc.collect()
+    baseline = rss_mb()
+
+    guild = state._add_guild_from_data(guild_payload(GUILD_ID, members))
+    every = max(1, round(1 / booster_ratio)) if booster_ratio > 0 else 0
+    now = datetime.now(timezone.utc)
+
+    def since(i: int) -> datetime | None:
+        return now - timedelta(hours=i) if every and i % every == 0 else None
+
+    if nitroping.LOW_MEMORY:
+        # No chunking: boosters reach the cache through GUILD_MEMBER_UPDATE (worst case: all of them).
+        for i in range(0, members, every or members + 1):
+            client._parse_member_update(member_payload(GUILD_ID, USER_ID_BASE + i, since(i)))
+    else:
+        # Startup chunking: every member arrives in GUILD_MEMBERS_CHUNK batches of 1000 and is cached.
+        for start in range(0, members, 1000):
+            chunk = [member_payload(GUILD_ID, USER_ID_BASE + i, since(i)) for i in range(start, min(members, start + 1000))]
+            for data in chunk:
+                guild._add_member(discord.Member(data=data, guild=guild, state=state))
+
+    client._booster_index[guild.id] = nitroping.BoosterIndex.from_members(guild.members)
+    gc.collect()
+    return {
+        "mode": "low-memory" if nitroping.LOW_MEMORY else "default",
+        "members": members,
+        "cached": len(guild._members),
+        "boosters": len(client._booster_index[guild.id]),
+        "rss_mb": round(rss_mb() - baseline, 1),
+    }
+
+def run_memory(args):
+    rows = []
+    for low in (False, True):
+        env = {**os.environ, "LOW_MEMORY": "1" if low else "0", "STORAGE_BACKEND": "json"}
+        out = subprocess.run(
+            [sys.executable, __file__, "_memory_worker", str(args.members), str(args.boosters)],
+            env=env, cwd=BASE_PATH, capture_output=True, text=True, check=True,
+        )
+        rows.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"{'mode':<12} {'members':>9} {'cached':>9} {'boosters':>9} {'cache RSS (MiB)':>16}")
+    for r in rows:
+        print(f"{r['mode']:<12} {r['members']:>9} {r['cached']:>9} {r['boosters']:>9} {r['rss_mb']:>16}")
+
+# --------------------------------------------------------------------------------------
+# replay: gateway event streams through the real parsers and handlers, fake REST layer
+# --------------------------------------------------------------------------------------
+# Stream format (one JSON object per line, ``python bench.py replay ... --save FILE``):
+#   {"op": "guild_create", "guild": 0, "members": 100, "boosters": 10, "setup": true}
+#   {"op": "boost" | "unboost", "guild": 0, "user": 42}
+#   {"op": "guild_boosts", "guild": 0, "count": 11}          GUILD_UPDATE with a new boost count
+#   {"op": "command", "guild": 0, "name": "boosters", "args": {}}
+# Guilds and users are small indexes; events marked "setup" are applied but not measured.
+
+def role_payload(role_id: int, name: str, position: int, permissions: int = 0) -> dict:
+    return {"id": str(role_id), "name": name, "permissions": str(permissions), "position": position,
+            "color": 0, "hoist": False, "managed": False, "mentionable": False}
+
+def world_guild_payload(g: int, members: int = 0, boosters: int = 0) -> dict:
+    """A guild with an announcement channel, a booster role the bot can manage and ``boosters`` boosting members."""
+    guild_id, channel_id = GUILD_ID + g, CHANNEL_ID_BASE + g
+    booster_role, bot_role = ROLE_ID_BASE + 2 * g, ROLE_ID_BASE + 2 * g + 1
+    data = guild_payload(guild_id, members + 1)
+    data.update({
+        "name": f"Synthetic {g}", "owner_id": str(USER_ID_BASE), "unavailable": False,
+        "system_channel_id": str(channel_id), "premium_subscription_count": boosters,
+        "roles": [data["roles"][0], role_payload(booster_role, "Booster", 1), role_payload(bot_role, "NitroPing", 2, 1 << 28)],
+        "channels": [{"id": str(channel_id), "type": 0, "name": "boosts", "position": 0,
+                      "permission_overwrites": [], "nsfw": False, "parent_id": None}],
+    })
+    now = datetime.now(timezone.utc)
+    data["members"] = [member_payload(guild_id, BOT_USER_ID, None, [bot_role])] + [
+        member_payload(guild_id, USER_ID_BASE + u, now - timedelta(days=u) if u < boosters else None,
+                       [booster_role] if u < boosters else [])
+        for u in range(members)
+    ]
+    return data
+
+def gen_startup(guilds: int, members: int, events: int) -> list[dict]:
+    return [{"op": "guild_create", "guild": g, "members": members, "boosters": min(events, members)} for g in range(guilds)]
+
+def gen_storm(guilds: int, members: int, events: int) -> list[dict]:
+    """Every guild gains ``events`` boosts at once; each arrives as a member update plus a guild update."""
+    stream = [{"op": "guild_create", "guild": g, "members": members, "boosters": 0, "setup": True} for g in range(guilds)]
+    for u in range(min(events, members)):
+        for g in range(guilds):
+            stream.append({"op": "boost", "guild": g, "user": u})
+            stream.append({"op": "guild_boosts", "guild": g, "count": u + 1})
+    return stream
+
+def gen_unboost(guilds: int, members: int, events: int) -> list[dict]:
+    """Every guild loses ``events`` boosters at once (e.g. a payment provider outage)."""
+    boosters = min(events, members)
+    stream = [{"op": "guild_create", "guild": g, "members": members, "boosters": boosters, "setup": True} for g in range(guilds)]
+    for u in range(boosters):
+        for g in range(guilds):
+            stream.append({"op": "unboost", "guild": g, "user": u})
+            stream.append({"op": "guild_boosts", "guild": g, "count": boosters - u - 1})
+    return stream
+
+def gen_commands(guilds: int, members: int, events: int) -> list[dict]:
+    rng = random.Random(0)
+    calls = [("boosters", {}), ("roles_list", {}), ("help", {}), ("test_boost", {}), ("set_message", {"message": "Thanks {user}!"}),
+             ("set_roles", {}), ("set_roles", {"search": "boo"})]
+    stream = [{"op": "guild_create", "guild": g, "members": members, "boosters": members // 10, "setup": True} for g in range(guilds)]
+    for _ in range(events * guilds):
+        name, args = rng.choice(calls)
+        stream.append({"op": "command", "guild": rng.randrange(guilds), "name": name, "args": args})
+    return stream
+
+SCENARIOS = {
+    # name: (generator, guilds, members per guild, events per guild)
+    "startup": (gen_startup, 10_000, 20, 2),
+    "storm": (gen_storm, 200, 100, 50),
+    "unboost": (gen_unboost, 200, 100, 50),
+    "commands": (gen_commands, 100, 200, 20),
+}
+
+class FakeRest:
+    """Stands in for ``HTTPClient.request``: records every call and answers with a minimal payload."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Counter[str] = Counter()
+        self._message_id = 0
+
+    async def request(self, route, **kwargs):
+        await self.record(route.method, route.path)
+        return self.respond(route, kwargs.get("json") or {})
+
+    async def record(self, method: str, path: str):
+        self.calls[f"{method} {path}"] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def respond(self, route, body: dict):
+        method, path = route.method, route.path
+        if method == "POST" and path == "/channels/{channel_id}/messages":
+            self._message_id += 1
+            return {"id": str(self._message_id), "channel_id": str(route.channel_id), "type": 0, "content": "",
+                    "attachments": [], "embeds": [], "mentions": [], "mention_roles": [], "pinned": False,
+                    "mention_everyone": False, "tts": False, "edited_timestamp": None, "components": [],
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                    "author": {"id": str(BOT_USER_ID), "username": "NitroPing", "discriminator": "0", "avatar": None}}
+        if method == "PATCH" and path == "/guilds/{guild_id}/members/{user_id}":
+            user_id = int(route.url.rsplit("/", 1)[1])
+            return member_payload(route.guild_id, user_id, None, [int(r) for r in body.get("roles", [])])
+        if method == "GET" and path == "/channels/{channel_id}":
+            return {"id": str(route.channel_id), "type": 0, "name": "boosts", "position": 0, "permission_overwrites": []}
+        return None
+
+    @property
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+class FakeResponse:
+    def __init__(self, rest: FakeRest):
+        self.rest = rest
+
+    async def send_message(self, *args, **kwargs):
+        await self.rest.record("POST", "/interactions/{interaction_id}/{interaction_token}/callback")
+
+    edit_message = send_message
+    defer = send_message
+
+class FakeInteraction:
+    """Just enough of ``discord.Interaction`` for the slash command callbacks."""
+
+    def __init__(self, guild, user, rest: FakeRest):
+        self.guild = guild
+        self.guild_id = guild.id
+        self.user = user
+        self.response = FakeResponse(rest)
+        self.extras: dict = {}
+
+def percentile(samples: list[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+async def replay_stream(nitroping, stream: list[dict], window: float, rest_latency: float, rate: float = 0,
+                        rest_rate: float | None = None) -> dict:
+    import discord
+
+    client = nitroping.bot
+    state = client._connection
+    await client._async_setup_hook()
+    state.user = discord.ClientUser(state=state, data={"id": str(BOT_USER_ID), "username": "NitroPing",
+                                                       "discriminator": "0", "avatar": None, "bot": True})
+    state._chunk_guilds = False  # chunking needs a gateway; synthetic guilds arrive complete
+
+    rest = FakeRest(rest_latency)
+    client.http.request = rest.request
+    nitroping.instrument_http(client.http)
+    nitroping.schedule_http(client.http)
+    # Like the bot, unless asked otherwise: REST_RATE shapes latency as much as the handlers do.
+    nitroping.scheduler.rate = nitroping.REST_RATE if rest_rate is None else rest_rate
+    client.announcer.window = window
+    client.correlator.window = window
+
+    # Like discord.py, every dispatched event runs its handler in its own task.
+    dispatched: list[asyncio.Task] = []
+
+    def dispatch(event: str, *args):
+        handler = getattr(client, f"on_{event}", None)
+        if handler is not None:
+            dispatched.append(asyncio.ensure_future(handler(*args)))
+
+    state.dispatch = dispatch
+
+    async def invoke(command, interaction: FakeInteraction, args: dict):
+        # The tree's check runs first, as for a real interaction (it marks the REST priority).
+        await client.tree.interaction_check(interaction)
+        await command.callback(interaction, **args)
+
+    latencies: list[float] = []
+
+    async def settle(started: float, tasks: list[asyncio.Task], measured: bool):
+        if tasks:
+            await asyncio.gather(*tasks)
+        if measured:
+            latencies.append(time.perf_counter() - started)
+
+    # State the bot would already have on disk: every guild's config and its booster records.
+    guild_data: dict[int, dict] = {}
+    seeds = []
+    for ev in stream:
+        if ev["op"] == "guild_create":
+            g, gid = ev["guild"], GUILD_ID + ev["guild"]
+            data = guild_data[g] = world_guild_payload(g, ev["members"], ev["boosters"])
+            seeds.append(nitroping.storage.save_guild_config(
+                gid, {**nitroping.default_guild_config(), "channel_id": str(CHANNEL_ID_BASE + g), "roles": [str(ROLE_ID_BASE + 2 * g)]}))
+            seeds.extend(nitroping.storage.save_user(gid, int(m["user"]["id"]), {"boost_start": m["premium_since"], "name": m["user"]["username"]})
+                         for m in data["members"][1:ev["boosters"] + 1])
+    for i in range(0, len(seeds), 5000):
+        await asyncio.gather(*seeds[i:i + 5000])
+
+    loop = asyncio.get_running_loop()
+    trackers: list[asyncio.Task] = []
+    setup_calls = 0
+    first = None
+    now = datetime.now(timezone.utc)
+
+    for ev in stream:
+        g, op = ev["guild"], ev["op"]
+        gid = GUILD_ID + g
+        setup = ev.get("setup", False)
+        if not setup:
+            if first is None:
+                first = loop.time()
+            elif rate:
+                ahead = first + len(trackers) / rate - loop.time()
+                if ahead > 0:
+                    await asyncio.sleep(ahead)
+
+        calls_before = rest.total
+        started = time.perf_counter()
+        if op == "guild_create":
+            client._parse_guild_create(guild_data[g])
+        elif op in ("boost", "unboost"):
+            boosting = op == "boost"
+            client._parse_member_update(member_payload(
+                gid, USER_ID_BASE + ev["user"], now if boosting else None,
+                [] if boosting else [ROLE_ID_BASE + 2 * g],
+            ))
+        elif op == "guild_boosts":
+            data = {k: v for k, v in guild_data[g].items() if k not in ("members", "channels")}
+            data["premium_subscription_count"] = ev["count"]
+            state.parsers["GUILD_UPDATE"](data)
+        elif op == "command":
+            guild = client.get_guild(gid)
+            user = guild.get_member(USER_ID_BASE) or discord.Member(
+                data=member_payload(gid, USER_ID_BASE, None), guild=guild, state=state)
+            command = client.tree.get_command(ev["name"])
+            dispatched.append(asyncio.ensure_future(invoke(command, FakeInteraction(guild, user, rest), ev.get("args", {}))))
+        else:
+            raise ValueError(f"unknown op {op!r}")
+
+        tasks = dispatched[:]
+        dispatched.clear()
+        if setup:
+            await settle(started, tasks, False)
+            setup_calls += rest.total - calls_before
+        else:
+            trackers.append(loop.create_task(settle(started, tasks, True)))
+            await asyncio.sleep(0)
+
+    if not trackers:
+        raise SystemExit("stream has no measured events")
+    await asyncio.gather(*trackers)
+    elapsed = loop.time() - first
+    # Whatever is still owed to Discord: role edits, delayed guild-level announcements, then the channel queues.
+    await asyncio.gather(*client._role_edits)
+    await asyncio.sleep(window * 2)
+    await client.announcer.join()
+    await nitroping.storage.flush()
+
+    measured = len(trackers)
+    return {
+        "events": measured,
+        "events_per_sec": round(measured / elapsed) if elapsed else 0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "rest_per_event": round((rest.total - setup_calls) / measured, 3),
+        "rest_calls": dict(rest.calls),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "rest_rate": nitroping.scheduler.rate,
+    }
+
+def run_replay(args):
+    if args.load:
+        with open(args.load) as f:
+            stream = [json.loads(line) for line in f if line.strip()]
+        name = Path(args.load).name
+    else:
+        gen, guilds, members, events = SCENARIOS[args.scenario]
+        stream = gen(args.guilds or guilds, args.members or members, args.events or events)
+        name = args.scenario
+    if args.save:
+        with open(args.save, "w") as f:
+            f.writelines(json.dumps(ev) + "\n" for ev in stream)
+
+    if args.rest_rate is not None or args.single_pass:
+        results = [replay_once(args, stream)]
+    else:
+        # With and without the REST limiter. The bot module keeps state, so each pass gets a process.
+        with tempfile.TemporaryDirectory(prefix="nitroping-bench-") as tmp:
+            path = os.path.join(tmp, "stream.jsonl")
+            with open(path, "w") as f:
+                f.writelines(json.dumps(ev) + "\n" for ev in stream)
+            results = [replay_subprocess(args, path, rest_rate) for rest_rate in (None, 0)]
+
+    mode = f"{'low-memory' if args.low_memory else 'default'}/{args.storage}"
+    print(f"{'stream':<16} {'mode':<18} {'REST/s':>7} {'events':>8} {'events/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'REST/event':>11} {'peak RSS MiB':>13}")
+    for result in results:
+        limit = f"{result['rest_rate']:g}" if result["rest_rate"] else "off"
+        print(f"{name:<16} {mode:<18} {limit:>7} {result['events']:>8} {result['events_per_sec']:>9} {result['p50_ms']:>8} "
+              f"{result['p99_ms']:>8} {result['rest_per_event']:>11} {result['peak_rss_mb']:>13}")
+    if args.verbose:
+        for route, count in sorted(results[0]["rest_calls"].items()):
+            print(f"  {count:>8}  {route}")
+    if args.json:
+        for result in results:
+            print(json.dumps(result))
+
+def replay_once(args, stream: list[dict]) -> dict:
+    # The bot reads its configuration at import time; keep its files out of the working tree.
+    tmp = tempfile.mkdtemp(prefix="nitroping-bench-")
+    os.environ.update({
+        "LOW_MEMORY": "1" if args.low_memory else "0", "STORAGE_BACKEND": args.storage,
+        "SERVERS_DIR": os.path.join(tmp, "servers"), "SQLITE_PATH": os.path.join(tmp, "nitroping.db"),
+        "SNAPSHOT_PATH": os.path.join(tmp, "boosters.snapshot"),
+        "HISTORY_DIR": os.path.join(tmp, "history"),
+    })
+    sys.path.insert(0, str(BASE_PATH))
+    import bot as nitroping
+
+    return asyncio.run(replay_stream(nitroping, stream, args.window, args.rest_latency, args.rate, args.rest_rate))
+
+def replay_subprocess(args, path: str, rest_rate: float | None) -> dict:
+    cmd = [sys.executable, __file__, "replay", "--load", path, "--single-pass", "--json",
+           "--storage", args.storage, "--window", str(args.window), "--rate", str(args.rate),
+           "--rest-latency", str(args.rest_latency)]
+    if args.low_memory:
+        cmd.append("--low-memory")
+    if rest_rate is not None:
+        cmd += ["--rest-rate", str(rest_rate)]
+    out = subprocess.run(cmd, cwd=BASE_PATH, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+# --------------------------------------------------------------------------------------
+# Fake Top.gg sender
+# --------------------------------------------------------------------------------------
+async def send_votes(url: str, auth: str, bot_id: str, votes: int, concurrency: int) -> dict:
+    """POST ``votes`` Top.gg-style webhooks to ``url`` (plus a few with a wrong secret)."""
+    import aiohttp
+
+    statuses: Counter = Counter()
+    latencies: list[float] = []
+    users = [USER_ID_BASE + i for i in range(votes)]
+    queue: asyncio.Queue = asyncio.Queue()
+    for user in users:
+        queue.put_nowait((user, auth))
+    for i in range(min(10, votes)):
+        queue.put_nowait((users[i], auth + "-wrong"))
+
+    async def worker(session):
+        while not queue.empty():
+            user, secret = queue.get_nowait()
+            body = {"bot": bot_id, "user": str(user), "type": "upvote", "isWeekend": False, "query": ""}
+            t0 = time.perf_counter()
+            async with session.post(url, json=body, headers={"Authorization": secret}) as resp:
+                await resp.read()
+                statuses[resp.status] += 1
+            latencies.append(time.perf_counter() - t0)
+
+    started = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "posts": len(latencies), "posts_per_sec": round(len(latencies) / elapsed), "statuses": dict(statuses),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2), "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "users": users,
+    }
+
+async def topgg_local(nitroping, args) -> dict:
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = nitroping.WebServer(client_max_size=16 * 1024)
+    server.app.router.add_post("/topgg", nitroping.votes.webhook)
+    await server.start("127.0.0.1", port)
+    try:
+        result = await send_votes(f"http://127.0.0.1:{port}/topgg", args.auth, nitroping.TOPGG_BOT_ID,
+                                  args.votes, args.concurrency)
+        await nitroping.storage.flush()
+        # Lookups come from the index; no API token is set, so nothing may leave the process.
+        lookups = []
+        hits = 0
+        for user in result["users"] + [1, 2, 3]:
+            t0 = time.perf_counter()
+            hits += await nitroping.votes.has_voted(user)
+            lookups.append(time.perf_counter() - t0)
+        result["hits"] = hits
+        result["lookup_p50_us"] = round(percentile(lookups, 0.5) * 1e6, 1)
+        result["lookup_p99_us"] = round(percentile(lookups, 0.99) * 1e6, 1)
+        # A fresh index (a restart, or another cluster) finds the votes through storage.
+        cold = nitroping.VoteIndex(nitroping.storage)
+        result["cold_hits"] = sum([await cold.has_voted(user) for user in result["users"][:100]])
+    finally:
+        await server.close()
+    return result
+
+def run_topgg(args):
+    if args.url:
+        result = asyncio.run(send_votes(args.url, args.auth, args.bot_id, args.votes, args.concurrency))
+    else:
+        tmp = tempfile.mkdtemp(prefix="nitroping-bench-")
+        os.environ.update({
+            "STORAGE_BACKEND": args.storage, "TOPGG_WEBHOOK_AUTH": args.auth, "TOPGG_API_TOKEN": "",
+            "TOPGG_BOT_ID": args.bot_id,
+            "SERVERS_DIR": os.path.join(tmp, "servers"), "SQLITE_PATH": os.path.join(tmp, "nitroping.db"),
+            "SNAPSHOT_PATH": os.path.join(tmp, "boosters.snapshot"), "HISTORY_DIR": os.path.join(tmp, "history"),
+        })
+        sys.path.insert(0, str(BASE_PATH))
+        import bot as nitroping
+        result = asyncio.run(topgg_local(nitroping, args))
+    result.pop("users")
+    print(json.dumps(result))
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "_memory_worker":
+        sys.path.insert(0, str(BASE_PATH))
+        print(json.dumps(memory_worker(int(sys.argv[2]), float(sys.argv[3]))))
+        return
+
+    parser = argparse.ArgumentParser(description="NitroPing offline benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    mem = sub.add_parser("memory", help="member-cache RSS, default vs LOW_MEMORY")
+    mem.add_argument("--members", type=int, default=500_000)
+    mem.add_argument("--boosters", type=float, default=0.02, help="fraction of members boosting")
+    rep = sub.add_parser("replay", help="replay a gateway event stream through the real handlers")
+    rep.add_argument("scenario", nargs="?", choices=sorted(SCENARIOS), default="storm")
+    rep.add_argument("--load", help="replay a JSONL stream instead of generating one")
+    rep.add_argument("--save", help="write the generated stream to this JSONL file")
+    rep.add_argument("--guilds", type=int)
+    rep.add_argument("--members", type=int, help="members per guild")
+    rep.add_argument("--events", type=int, help="events per guild (boosts, unboosts, commands; boosters for startup)")
+    rep.add_argument("--low-memory", action="store_true")
+    rep.add_argument("--storage", choices=("json", "sqlite"), default="sqlite")
+    rep.add_argument("--window", type=float, default=0.05, help="announce/correlation window in seconds")
+    rep.add_argument("--rate", type=float, default=0, help="events per second to replay at (0: as fast as possible)")
+    rep.add_argument("--rest-rate", type=float,
+                     help="REST scheduler budget in requests/s (0: unlimited); default: the bot's REST_RATE, "
+                          "reported next to an unlimited run")
+    rep.add_argument("--single-pass", action="store_true", help=argparse.SUPPRESS)
+    rep.add_argument("--rest-latency", type=float, default=0.0, help="simulated seconds per REST call")
+    rep.add_argument("--verbose", action="store_true", help="break REST calls down by route")
+    rep.add_argument("--json", action="store_true", help="also print the result as JSON")
+    top = sub.add_parser("topgg", help="send fake Top.gg vote webhooks (to an in-process receiver by default)")
+    top.add_argument("--url", help="send to a running bot's webhook instead, e.g. http://127.0.0.1:5000/topgg")
+    top.add_argument("--auth", default="bench-secret", help="TOPGG_WEBHOOK_AUTH of the receiver")
+    top.add_argument("--bot-id", default=str(BOT_USER_ID))
+    top.add_argument("--votes", type=int, default=2000)
+    top.add_argument("--concurrency", type=int, default=20)
+    top.add_argument("--storage", choices=("json", "sqlite"), default="sqlite")
+    args = parser.parse_args()
+
+    if args.command == "memory":
+        run_memory(args)
+    elif args.command == "topgg":
+        run_topgg(args)
+    else:
+        run_replay(args)
+
+if __name__ == "__main__":
+    main()
@@ -3,122 +3,3094 @@ import os
 import sys
 import json
 import re
+import string
+import time
+import asyncio
+import uuid
+import struct
+import gzip
+import zlib
+import io
+import sqlite3
+import argparse
+import bisect
+import heapq
+import hashlib
+import hmac
+import logging
+import logging.handlers
+import queue
+import threading
+import atexit
+import functools
+import contextvars
+import signal
+import multiprocessing
+import multiprocessing.connection
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
 
+import aiohttp
+import aiohttp.web
 import discord
 from discord.ext import commands
 from discord import app_commands
 from dotenv import load_dotenv
 
+PROCESS_STARTED = time.perf_counter()
+
+class StartupProfile:
+    """Timestamps of startup milestones; ``report()`` turns them into per-phase durations."""
+
+    def __init__(self, started: float):
+        self.started = started
+        self.marks: list[tuple[str, float]] = []
+
+    def mark(self, phase: str):
+        if not any(name == phase for name, _ in self.marks):
+            self.marks.append((phase, time.perf_counter()))
+
+    def report(self) -> str:
+        parts = []
+        previous = self.started
+        for phase, at in self.marks:
+            parts.append(f"{phase} {at - previous:.2f}s")
+            previous = at
+        return ", ".join(parts) + f" (total {previous - self.started:.2f}s)"
+
+startup_profile = StartupProfile(PROCESS_STARTED)
+
 # --------------------------------------------------------------------------------------
 # Environment
 # --------------------------------------------------------------------------------------
 BASE_PATH = Path(__file__).resolve().parent
 ENV_PATH = BASE_PATH / ".env"
 load_dotenv(ENV_PATH if ENV_PATH.exists() else None)
+startup_profile.mark("env load")
 
 TOKEN = os.getenv("BOT_TOKEN")
-if not TOKEN or not TOKEN.strip():
-    print("[NitroPing] ERROR: BOT_TOKEN is missing.")
-    print(f"[NitroPing] Looked for .env at: {ENV_PATH}")
-    print(f"[NitroPing] .env exists? {ENV_PATH.exists()}")
-    print(f"[NitroPing] Current working dir: {Path.cwd()}")
-    sys.exit(1)
+
+# --------------------------------------------------------------------------------------
+# Logging (JSON lines written by a background thread, sampled per guild and message)
+# --------------------------------------------------------------------------------------
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").strip().upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").strip().lower()
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", "10"))
+LOG_SAMPLE_INTERVAL = float(os.getenv("LOG_SAMPLE_INTERVAL", "60"))
+
+log = logging.getLogger("nitroping")
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; ``extra=`` context fields and tracebacks become keys."""
+
+    FIELDS = ("guild_id", "user_id", "channel_id", "event", "suppressed")
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.processName != "MainProcess":
+            entry["process"] = record.processName
+        fields = record.__dict__
+        for field in self.FIELDS:
+            value = fields.get(field)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class LogSampler(logging.Filter):
+    """Let ``burst`` records per (guild, message template) through every ``interval`` seconds.
+
+    Runs in the calling thread before the record is queued, so a dropped record costs one dict
+    lookup and is never formatted. The next record let through for that key carries ``suppressed=<dropped count>``.
+    """
+
+    def __init__(self, burst: int, interval: float, max_keys: int = 10000):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.max_keys = max_keys
+        self._windows: OrderedDict[tuple, list] = OrderedDict()  # key -> [window start, seen, suppressed]
+        self._lock = threading.Lock()  # storage and history threads log too
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0:
+            return True
+        key = (getattr(record, "guild_id", None), record.msg if isinstance(record.msg, str) else type(record.msg))
+        with self._lock:
+            return self._admit(key, record)
+
+    def _admit(self, key: tuple, record: logging.LogRecord) -> bool:
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= self.interval:
+            if window is not None and window[2]:
+                record.suppressed = window[2]
+            self._windows[key] = [now, 1, 0]
+            self._windows.move_to_end(key)
+            if len(self._windows) > self.max_keys:
+                self._windows.popitem(last=False)
+            return True
+        if window[1] < self.burst:
+            window[1] += 1
+            return True
+        window[2] += 1
+        self.suppressed += 1
+        return False
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting (and tracebacks) happen on the writer thread, not in the event loop.
+        return record
+
+log_sampler = LogSampler(LOG_SAMPLE_BURST, LOG_SAMPLE_INTERVAL)
+_log_listener: logging.handlers.QueueListener | None = None
+
+def setup_logging():
+    """Route every logger (discord.py included) through one queue to a writer thread on stdout."""
+    global _log_listener
+    if _log_listener is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "text":
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    else:
+        output.setFormatter(JsonFormatter())
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _QueueHandler(records)
+    handler.addFilter(log_sampler)
+    # Records never show file/line, so skip the stack walk every log call would otherwise pay for.
+    logging._srcfile = None
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    # The 429 counters below need discord.http warnings whatever LOG_LEVEL says.
+    logging.getLogger("discord.http").setLevel(min(logging.WARNING, root.level))
+    _log_listener = logging.handlers.QueueListener(records, output)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
 
 # --------------------------------------------------------------------------------------
 # Discord Intents & helpers
 # --------------------------------------------------------------------------------------
 intents = discord.Intents.default()
 intents.members = True
-intents.message_content = True
 intents.guilds = True
 
+# Low-memory mode: no startup chunking and no general member cache. Only boosters (and
+# members that used an interaction) are kept; everything else comes from the booster
+# records the bot persists itself.
+LOW_MEMORY = os.getenv("LOW_MEMORY", "0").strip().lower() in ("1", "true", "yes", "on")
+
+def member_cache_flags() -> discord.MemberCacheFlags:
+    return discord.MemberCacheFlags.none() if LOW_MEMORY else discord.MemberCacheFlags.from_intents(intents)
+
 UTCNOW = getattr(discord.utils, "utcnow", datetime.utcnow)
 
-SERVERS_DIR = BASE_PATH / "servers"
-SERVERS_DIR.mkdir(parents=True, exist_ok=True)
-
-def ensure_guild_config(guild_id: int) -> Path:
-    gdir = SERVERS_DIR / str(guild_id)
-    gdir.mkdir(parents=True, exist_ok=True)
-    cfg = gdir / f"{guild_id}.json"
-    if not cfg.exists():
-        cfg.write_text(
-            json.dumps(
-                {"channel_id": None, "message": "Thank you for boosting the server!", "roles": []},
-                ensure_ascii=False
-            ),
-            encoding="utf-8"
+SERVERS_DIR = Path(os.getenv("SERVERS_DIR") or BASE_PATH / "servers")
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json").strip().lower()
+SQLITE_PATH = Path(os.getenv("SQLITE_PATH") or BASE_PATH / "nitroping.db")
+COMMAND_HASH_PATH = BASE_PATH / ".command_tree_hash"
+
+DEFAULT_MESSAGE = "Thank you for boosting the server!"
+
+def default_guild_config() -> dict:
+    return {"channel_id": None, "message": DEFAULT_MESSAGE, "roles": []}
+
+# --------------------------------------------------------------------------------------
+# Message templates & embed factory
+# --------------------------------------------------------------------------------------
+TEMPLATE_FIELDS = {
+    "user": "the booster (a mention)",
+    "count": "the server's boost count",
+    "tier": "the server's boost level",
+    "days": "days the member has been boosting",
+}
+MAX_MESSAGE_LENGTH = 1000
+
+class TemplateError(ValueError):
+    """A thank-you message that can't be used as a template; the text is shown to the admin."""
+
+class MessageTemplate:
+    """A thank-you message parsed once into literal text and ``{placeholder}`` slots."""
+
+    __slots__ = ("source", "fields", "_parts", "_static")
+
+    def __init__(self, source: str, parts: list[tuple[str, str | None]]):
+        self.source = source
+        self._parts = parts
+        self.fields = frozenset(field for _, field in parts if field)
+        self._static = None if self.fields else "".join(literal for literal, _ in parts)
+
+    def render(self, **values) -> str:
+        if self._static is not None:
+            return self._static
+        return "".join(literal + (str(values[field]) if field else "") for literal, field in self._parts)
+
+    def render_for(self, guild: discord.Guild, user: str, days: int = 0) -> str:
+        return self.render(user=user, count=guild.premium_subscription_count or 0, tier=guild.premium_tier, days=days)
+
+    def thank(self, guild: discord.Guild, mention: str, days: int = 0) -> str:
+        """The announcement line: messages without ``{user}`` keep the old "@member message" form."""
+        text = self.render_for(guild, mention, days)
+        return text if "user" in self.fields else f"{mention} {text}"
+
+def compile_template(source: str) -> MessageTemplate:
+    """Validate ``source`` and split it into parts. Raises ``TemplateError`` with a readable reason."""
+    if len(source) > MAX_MESSAGE_LENGTH:
+        raise TemplateError(f"The message is too long ({len(source)}/{MAX_MESSAGE_LENGTH} characters).")
+    parts = []
+    try:
+        for literal, field, spec, conversion in string.Formatter().parse(source):
+            if field is not None and field not in TEMPLATE_FIELDS:
+                available = ", ".join(f"{{{name}}}" for name in TEMPLATE_FIELDS)
+                raise TemplateError(f"Unknown placeholder `{{{field}}}`. Available: {available}. Use `{{{{` and `}}}}` for literal braces.")
+            if spec or conversion:
+                raise TemplateError(f"Placeholders can't be formatted: write `{{{field}}}` on its own.")
+            parts.append((literal, field))
+    except TemplateError:
+        raise
+    except ValueError as e:
+        raise TemplateError(f"The message has unbalanced braces ({e}). Use `{{{{` and `}}}}` for literal braces.") from None
+    return MessageTemplate(source, parts)
+
+@functools.lru_cache(maxsize=4096)
+def template_for(source: str) -> MessageTemplate:
+    """Compiled template for a stored message, cached by its text (most guilds share the default).
+
+    Messages saved before placeholders existed may not parse; those are used verbatim.
+    """
+    try:
+        return compile_template(source)
+    except TemplateError:
+        return MessageTemplate(source, [(source, None)])
+
+def guild_template(config: dict) -> MessageTemplate:
+    return template_for(config.get("message") or DEFAULT_MESSAGE)
+
+class EmbedFactory:
+    """Builds the bot's purple embeds. The footer only changes with the date, so its text is kept."""
+
+    def __init__(self, bot_name: str):
+        self.bot_name = bot_name
+        self.color = discord.Color.purple()
+        self._day = -1
+        self._footer = ""
+
+    def footer(self) -> str:
+        day = int(time.time() // 86400)
+        if day != self._day:
+            self._day = day
+            self._footer = f"{self.bot_name} • Silent Ember Hosting • {datetime.utcnow().strftime('%Y-%m-%d')}"
+        return self._footer
+
+    def make(self, title: str | None = None, description: str | None = None, *,
+             thumbnail: discord.Asset | None = None, footer: bool = True) -> discord.Embed:
+        embed = discord.Embed(title=title, description=description, color=self.color, timestamp=UTCNOW())
+        if footer:
+            embed.set_footer(text=self.footer())
+        if thumbnail is not None:
+            embed.set_thumbnail(url=thumbnail.url)
+        return embed
+
+# --------------------------------------------------------------------------------------
+# Metrics (Prometheus text format, served on METRICS_PORT when set)
+# --------------------------------------------------------------------------------------
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0")) or None
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Metrics:
+    """In-process counters and histograms, plus gauges sampled at scrape time.
+
+    Recording is a dict lookup and an increment (a bisect for histograms), cheap enough to
+    leave on under full load.
+    """
+
+    def __init__(self):
+        self._meta: dict[str, tuple[str, str]] = {}
+        self._counters: dict[str, dict[tuple, float]] = {}
+        self._histograms: dict[str, dict[tuple, Histogram]] = {}
+        self._gauges: dict[str, object] = {}
+
+    def counter(self, name: str, help_text: str):
+        self._meta[name] = ("counter", help_text)
+        self._counters[name] = {}
+
+    def histogram(self, name: str, help_text: str):
+        self._meta[name] = ("histogram", help_text)
+        self._histograms[name] = {}
+
+    def gauge(self, name: str, help_text: str, func, kind: str = "gauge"):
+        """Sampled at scrape time. ``func()`` returns a number or a list of ``(labels dict, number)`` pairs.
+
+        Use ``kind="counter"`` for monotonic totals kept elsewhere.
+        """
+        self._meta[name] = (kind, help_text)
+        self._gauges[name] = func
+
+    def inc(self, name: str, value: float = 1, **labels):
+        series = self._counters[name]
+        key = tuple(labels.items())
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        series = self._histograms[name]
+        key = tuple(labels.items())
+        hist = series.get(key)
+        if hist is None:
+            hist = series[key] = Histogram(LATENCY_BUCKETS)
+        hist.observe(value)
+
+    @staticmethod
+    def _labels(pairs, extra: tuple = ()) -> str:
+        items = list(pairs) + list(extra)
+        if not items:
+            return ""
+        body = ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in items)
+        return "{" + body + "}"
+
+    def render(self) -> str:
+        lines = []
+        for name, (kind, help_text) in self._meta.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if name in self._counters:
+                for key, value in self._counters[name].items():
+                    lines.append(f"{name}{self._labels(key)} {value}")
+            elif name in self._histograms:
+                for key, hist in self._histograms[name].items():
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{self._labels(key, (('le', bound),))} {cumulative}")
+                    lines.append(f"{name}_bucket{self._labels(key, (('le', '+Inf'),))} {hist.count}")
+                    lines.append(f"{name}_sum{self._labels(key)} {hist.sum}")
+                    lines.append(f"{name}_count{self._labels(key)} {hist.count}")
+            else:
+                try:
+                    value = self._gauges[name]()
+                except Exception:
+                    continue
+                if isinstance(value, list):
+                    for labels, v in value:
+                        lines.append(f"{name}{self._labels(labels.items())} {v}")
+                else:
+                    lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+metrics.histogram("nitroping_handler_seconds", "Gateway event handler latency.")
+metrics.histogram("nitroping_command_seconds", "Slash command latency from dispatch to completion.")
+metrics.counter("nitroping_rest_requests_total", "REST requests by route and outcome.")
+metrics.histogram("nitroping_rest_seconds", "REST request latency by route, including rate-limit waits.")
+metrics.counter("nitroping_rest_ratelimited_total", "429 responses by route.")
+metrics.counter("nitroping_rest_global_ratelimited_total", "Global rate-limit hits.")
+metrics.histogram("nitroping_storage_seconds", "Storage operation latency on the I/O pool.")
+metrics.histogram("nitroping_rest_queue_seconds", "Time REST calls waited in the scheduler, by priority.")
+
+_current_route: contextvars.ContextVar[str] = contextvars.ContextVar("nitroping_route", default="unknown")
+
+class _RateLimitLogHandler(logging.Handler):
+    """discord.py only reports 429s through its logger; count them per route."""
+
+    def emit(self, record: logging.LogRecord):
+        msg = record.msg if isinstance(record.msg, str) else ""
+        if msg.startswith("We are being rate limited"):
+            metrics.inc("nitroping_rest_ratelimited_total", route=_current_route.get())
+        elif msg.startswith("Global rate limit"):
+            metrics.inc("nitroping_rest_global_ratelimited_total")
+            scheduler.note_ratelimit(record.args[-1])
+
+logging.getLogger("discord.http").addHandler(_RateLimitLogHandler(logging.WARNING))
+
+def instrument_http(http: discord.http.HTTPClient):
+    """Wrap ``HTTPClient.request`` so every REST call is counted and timed per route template."""
+    request = http.request
+
+    async def instrumented(route: discord.http.Route, **kwargs):
+        label = f"{route.method} {route.path}"
+        token = _current_route.set(label)
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            return await request(route, **kwargs)
+        except discord.HTTPException as e:
+            status = str(e.status)
+            raise
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            _current_route.reset(token)
+            metrics.inc("nitroping_rest_requests_total", route=label, status=status)
+            metrics.observe("nitroping_rest_seconds", time.perf_counter() - started, route=label)
+
+    http.request = instrumented
+
+def timed_handler(func):
+    """Record an event handler's latency under its method name."""
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            metrics.observe("nitroping_handler_seconds", time.perf_counter() - started, handler=name)
+
+    return wrapper
+
+class WebServer:
+    """Small aiohttp server on the bot's event loop for local endpoints."""
+
+    def __init__(self, client_max_size: int = 1024 ** 2):
+        self.app = aiohttp.web.Application(client_max_size=client_max_size)
+        self._runner: aiohttp.web.AppRunner | None = None
+
+    async def start(self, host: str, port: int):
+        self._runner = aiohttp.web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await aiohttp.web.TCPSite(self._runner, host, port).start()
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+async def metrics_endpoint(request: aiohttp.web.Request) -> aiohttp.web.Response:
+    return aiohttp.web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8",
+                                headers={"X-Content-Type-Options": "nosniff"})
+
+# --------------------------------------------------------------------------------------
+# Outbound REST scheduling (priorities, global budget, shedding)
+# --------------------------------------------------------------------------------------
+REST_RATE = float(os.getenv("REST_RATE", "40"))  # requests/s across the bot; Discord's global cap is 50
+
+class RestShed(discord.DiscordException):
+    """A low-priority REST call was dropped instead of queued behind more important work."""
+
+_rest_priority: contextvars.ContextVar[int | None] = contextvars.ContextVar("nitroping_rest_priority", default=None)
+
+class RestScheduler:
+    """Admits every ``HTTPClient.request`` call in priority order within one global budget.
+
+    Priorities, highest first: interaction work, role edits, unmarked calls (login, command
+    sync, anything not tagged), announcements, background jobs. Interaction work never waits;
+    it may overdraw the budget, which the other levels then pay back. The rest queue for a token
+    (``rate`` per second, ``burst`` at once). Only calls marked as announcement or background
+    work are also held back while their route's bucket is exhausted or after a global 429, and
+    shed (``RestShed``) once their queue is full or they waited too long.
+
+    Interaction responses themselves go through discord.py's webhook adapter and never pass
+    through here. The REST calls a command makes are marked as interaction work by the
+    command tree, and the budget keeps the bot clear of the global rate limit that would
+    stall them.
+    """
+
+    INTERACTION, ROLE, OTHER, ANNOUNCE, BACKGROUND = range(5)
+    NAMES = ("interaction", "role", "other", "announce", "background")
+
+    def __init__(self, rate: float, burst: int = 10,
+                 max_waiting: tuple = (None, None, None, 500, 100), max_wait: tuple = (None, None, None, 120.0, 30.0)):
+        self.rate = rate
+        self.burst = burst
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._heap: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = 0
+        self._wakeup: asyncio.Event | None = None
+        self._pump: asyncio.Task | None = None
+        self.waiting = [0] * len(self.NAMES)
+        self.shed = [0] * len(self.NAMES)
+
+    @classmethod
+    def classify(cls, route: discord.http.Route) -> int:
+        level = _rest_priority.get()
+        if level is not None:
+            return level
+        if route.path.startswith(("/interactions/", "/webhooks/{webhook_id}/{webhook_token}")):
+            return cls.INTERACTION
+        if route.path.startswith("/guilds/{guild_id}/members/{user_id}") and route.method != "GET":
+            return cls.ROLE
+        # Never shed: AnnouncementQueue and the reconciler mark their own calls.
+        return cls.OTHER
+
+    def note_ratelimit(self, retry_after: float):
+        """The global rate limit was hit: keep announcement and background traffic off the wire until it clears."""
+        self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, level: int):
+        if not self.rate:
+            return
+        if level == self.INTERACTION:
+            self._refill()
+            self._tokens -= 1
+            return
+        limit = self.max_waiting[level]
+        if limit is not None and self.waiting[level] >= limit:
+            self._shed(level)
+
+        loop = asyncio.get_running_loop()
+        if self._pump is None or self._pump.done():
+            self._wakeup = asyncio.Event()
+            self._pump = loop.create_task(self._run())
+        future = loop.create_future()
+        self._seq += 1
+        heapq.heappush(self._heap, (level, self._seq, future))
+        self.waiting[level] += 1
+        self._wakeup.set()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, self.max_wait[level])
+        except asyncio.TimeoutError:
+            self._shed(level)
+        finally:
+            self.waiting[level] -= 1
+            metrics.observe("nitroping_rest_queue_seconds", time.perf_counter() - started, priority=self.NAMES[level])
+
+    def _shed(self, level: int):
+        self.shed[level] += 1
+        raise RestShed(f"{self.NAMES[level]} REST call shed under load")
+
+    async def _run(self):
+        while True:
+            while self._heap and self._heap[0][2].done():
+                heapq.heappop(self._heap)  # timed out or cancelled while queued
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            level = self._heap[0][0]
+            self._refill()
+            wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.0
+            if level >= self.ANNOUNCE:
+                wait = max(wait, self._paused_until - time.monotonic())
+            if wait > 0:
+                # Woken early when something more important arrives.
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, future = heapq.heappop(self._heap)
+            if not future.done():
+                self._tokens -= 1
+                future.set_result(None)
+
+def _bucket_wait(http: discord.http.HTTPClient, route: discord.http.Route) -> float:
+    """Seconds until discord.py's rate-limit bucket for ``route`` has requests left (0 if it has some)."""
+    bucket_hash = http._bucket_hashes.get(route.key)
+    bucket = http._buckets.get(f"{bucket_hash or route.key}:{route.major_parameters}")
+    if bucket is None or bucket.remaining > 0 or bucket.expires is None:
+        return 0.0
+    return max(0.0, bucket.expires - asyncio.get_running_loop().time())
+
+def schedule_http(http: discord.http.HTTPClient):
+    """Route every ``HTTPClient.request`` call through the REST scheduler."""
+    request = http.request
+
+    async def scheduled(route: discord.http.Route, **kwargs):
+        level = RestScheduler.classify(route)
+        if level >= RestScheduler.ANNOUNCE:
+            # Don't hold a global token while the route's own bucket is empty.
+            wait = _bucket_wait(http, route)
+            if wait > 0:
+                await asyncio.sleep(wait)
+        await scheduler.acquire(level)
+        return await request(route, **kwargs)
+
+    http.request = scheduled
+
+class rest_priority:
+    """``with rest_priority(RestScheduler.BACKGROUND): ...`` marks the REST calls made inside the block."""
+
+    def __init__(self, level: int):
+        self.level = level
+        self._token = None
+
+    def __enter__(self):
+        self._token = _rest_priority.set(self.level)
+        return self
+
+    def __exit__(self, *exc):
+        _rest_priority.reset(self._token)
+
+scheduler = RestScheduler(REST_RATE)
+
+# --------------------------------------------------------------------------------------
+# Storage (all file I/O runs on a bounded thread pool, never on the event loop)
+# --------------------------------------------------------------------------------------
+def _read_json_file(path: Path) -> dict | None:
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _write_bytes_file(path: Path, blob: bytes):
+    """Atomic write: dump to a temp file in the same directory, fsync, then rename over the target."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with tmp.open("wb") as f:
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+def _write_json_file(path: Path, data: dict):
+    _write_bytes_file(path, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+class StorageBackend:
+    """Async persistence for guild configs and booster records.
+
+    Implementations run their blocking I/O on their own executor so callers on the
+    event loop only ever await.
+    """
+
+    def __init__(self, max_workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nitroping-io")
+
+    async def _run(self, func, *args):
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            metrics.observe("nitroping_storage_seconds", time.perf_counter() - started, op=func.__name__.strip("_"))
+
+    async def load_guild_config(self, guild_id: int) -> dict:
+        raise NotImplementedError
+
+    async def save_guild_config(self, guild_id: int, config: dict):
+        raise NotImplementedError
+
+    async def load_user(self, guild_id: int, user_id: int) -> dict | None:
+        raise NotImplementedError
+
+    async def save_user(self, guild_id: int, user_id: int, data: dict):
+        raise NotImplementedError
+
+    async def load_boosters(self, guild_id: int) -> dict[int, dict]:
+        """Persisted records of everyone currently boosting ``guild_id`` (``boost_start`` set)."""
+        raise NotImplementedError
+
+    async def load_vote(self, user_id: int) -> float | None:
+        """When ``user_id``'s last recorded Top.gg vote expires (a timestamp), if one was recorded."""
+        raise NotImplementedError
+
+    async def save_vote(self, user_id: int, expires: float):
+        raise NotImplementedError
+
+    async def flush(self):
+        """Wait until every accepted write has reached disk."""
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+class JsonStorage(StorageBackend):
+    """servers/<guild_id>/<guild_id>.json plus one <user_id>.json per booster (the default layout)."""
+
+    def __init__(self, root: Path, max_workers: int = 4):
+        super().__init__(max_workers)
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._votes_pruned = 0.0
+
+    def config_path(self, guild_id: int) -> Path:
+        return self.root / str(guild_id) / f"{guild_id}.json"
+
+    def user_path(self, guild_id: int, user_id: int) -> Path:
+        return self.root / str(guild_id) / f"{user_id}.json"
+
+    async def read_json(self, path: Path) -> dict | None:
+        return await self._run(_read_json_file, path)
+
+    async def write_json(self, path: Path, data: dict):
+        await self._run(_write_json_file, path, data)
+
+    def _ensure_guild_config(self, guild_id: int) -> dict:
+        cfg = self.config_path(guild_id)
+        try:
+            data = _read_json_file(cfg)
+        except Exception:
+            data = {}
+        if data is None:
+            data = default_guild_config()
+            _write_json_file(cfg, data)
+        return data
+
+    async def load_guild_config(self, guild_id: int) -> dict:
+        """Read a guild config, creating the default file on first use."""
+        return {**default_guild_config(), **await self._run(self._ensure_guild_config, guild_id)}
+
+    async def save_guild_config(self, guild_id: int, config: dict):
+        await self.write_json(self.config_path(guild_id), config)
+
+    async def load_user(self, guild_id: int, user_id: int) -> dict | None:
+        return await self.read_json(self.user_path(guild_id, user_id))
+
+    async def save_user(self, guild_id: int, user_id: int, data: dict):
+        await self.write_json(self.user_path(guild_id, user_id), data)
+
+    def _load_boosters(self, guild_id: int) -> dict[int, dict]:
+        records = {}
+        gdir = self.root / str(guild_id)
+        for f in gdir.glob("*.json") if gdir.exists() else ():
+            if not f.stem.isdigit() or int(f.stem) == guild_id:
+                continue
+            try:
+                data = _read_json_file(f)
+            except Exception:
+                continue
+            if data and data.get("boost_start"):
+                records[int(f.stem)] = data
+        return records
+
+    async def load_boosters(self, guild_id: int) -> dict[int, dict]:
+        return await self._run(self._load_boosters, guild_id)
+
+    VOTE_PRUNE_INTERVAL = 3600.0
+
+    def vote_path(self, user_id: int) -> Path:
+        return self.root / "votes" / f"{user_id}.json"
+
+    async def load_vote(self, user_id: int) -> float | None:
+        path = self.vote_path(user_id)
+        data = await self.read_json(path)
+        expires = data.get("expires") if data else None
+        if expires is not None and expires < time.time():
+            await self._run(path.unlink, True)
+            return None
+        return expires
+
+    async def save_vote(self, user_id: int, expires: float):
+        await self.write_json(self.vote_path(user_id), {"expires": expires})
+        # Most voters never ask again, so load_vote alone would leave their files behind.
+        now = time.time()
+        if now - self._votes_pruned >= self.VOTE_PRUNE_INTERVAL:
+            self._votes_pruned = now
+            await self._run(self._prune_votes, now)
+
+    def _prune_votes(self, now: float):
+        try:
+            entries = list(os.scandir(self.root / "votes"))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                data = _read_json_file(Path(entry.path)) or {}
+                # A vote saved since we read the file replaced it with a new inode: keep that one.
+                if data.get("expires", 0) < now and os.stat(entry.path).st_ino == entry.inode():
+                    os.unlink(entry.path)
+            except (OSError, ValueError):
+                continue
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS guild_configs (
+    guild_id INTEGER PRIMARY KEY,
+    data     TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS boosters (
+    guild_id    INTEGER NOT NULL,
+    user_id     INTEGER NOT NULL,
+    boost_start TEXT,
+    name        TEXT,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS boosters_active ON boosters (guild_id, boost_start) WHERE boost_start IS NOT NULL;
+CREATE TABLE IF NOT EXISTS votes (
+    user_id INTEGER PRIMARY KEY,
+    expires REAL NOT NULL
+);
+"""
+
+def open_sqlite(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")  # cluster workers share the file
+    conn.executescript(SQLITE_SCHEMA)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(boosters)")}
+    if "name" not in columns:  # databases created before display names were stored
+        conn.execute("ALTER TABLE boosters ADD COLUMN name TEXT")
+    return conn
+
+class SqliteStorage(StorageBackend):
+    """Single-file SQLite (WAL) backend.
+
+    The connection is owned by a one-thread executor, so statements run in submission order.
+    Writes are coalesced per key and committed together in one transaction every
+    ``batch_delay`` seconds (or as soon as ``batch_size`` writes are pending); reads see
+    pending writes immediately.
+    """
+
+    def __init__(self, path: Path, batch_size: int = 500, batch_delay: float = 0.05):
+        super().__init__(max_workers=1)
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self._conn = open_sqlite(path)
+        self._pending: dict[tuple, tuple[str, tuple, dict]] = {}
+        self._waiters: list[asyncio.Future] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._flushes: set[asyncio.Task] = set()
+
+    def _fetchone(self, sql: str, params: tuple):
+        return self._conn.execute(sql, params).fetchone()
+
+    def _fetchall(self, sql: str, params: tuple):
+        return self._conn.execute(sql, params).fetchall()
+
+    def _commit(self, statements: list[tuple[str, tuple]]):
+        with self._conn:
+            self._conn.execute("BEGIN")
+            for sql, params in statements:
+                self._conn.execute(sql, params)
+
+    def _start_flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        batch, waiters = self._pending, self._waiters
+        self._pending, self._waiters = {}, []
+        task = asyncio.get_running_loop().create_task(self._flush_batch(list(batch.values()), waiters))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush_batch(self, batch: list, waiters: list[asyncio.Future]):
+        try:
+            await self._run(self._commit, [(sql, params) for sql, params, _ in batch])
+        except Exception as e:
+            for fut in waiters:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for fut in waiters:
+            if not fut.done():
+                fut.set_result(None)
+
+    async def _write(self, key: tuple, sql: str, params: tuple, value: dict):
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending[key] = (sql, params, value)
+        self._waiters.append(fut)
+        if len(self._pending) >= self.batch_size:
+            self._start_flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_delay, self._start_flush)
+        await fut
+
+    async def load_guild_config(self, guild_id: int) -> dict:
+        pending = self._pending.get(("config", guild_id))
+        if pending is not None:
+            return dict(pending[2])
+        row = await self._run(self._fetchone, "SELECT data FROM guild_configs WHERE guild_id = ?", (guild_id,))
+        try:
+            data = json.loads(row[0]) if row else {}
+        except Exception:
+            data = {}
+        return {**default_guild_config(), **data}
+
+    async def save_guild_config(self, guild_id: int, config: dict):
+        await self._write(
+            ("config", guild_id),
+            "INSERT OR REPLACE INTO guild_configs (guild_id, data) VALUES (?, ?)",
+            (guild_id, json.dumps(config, ensure_ascii=False)),
+            dict(config),
+        )
+
+    async def load_user(self, guild_id: int, user_id: int) -> dict | None:
+        pending = self._pending.get(("user", guild_id, user_id))
+        if pending is not None:
+            return dict(pending[2])
+        row = await self._run(
+            self._fetchone, "SELECT boost_start, name FROM boosters WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)
+        )
+        return {"boost_start": row[0], "name": row[1]} if row else None
+
+    async def save_user(self, guild_id: int, user_id: int, data: dict):
+        await self._write(
+            ("user", guild_id, user_id),
+            "INSERT OR REPLACE INTO boosters (guild_id, user_id, boost_start, name) VALUES (?, ?, ?, ?)",
+            (guild_id, user_id, data.get("boost_start"), data.get("name")),
+            dict(data),
+        )
+
+    async def load_boosters(self, guild_id: int) -> dict[int, dict]:
+        rows = await self._run(
+            self._fetchall,
+            "SELECT user_id, boost_start, name FROM boosters WHERE guild_id = ? AND boost_start IS NOT NULL",
+            (guild_id,),
+        )
+        records = {uid: {"boost_start": start, "name": name} for uid, start, name in rows}
+        for key, (_, _, value) in self._pending.items():
+            if key[0] == "user" and key[1] == guild_id:
+                if value.get("boost_start"):
+                    records[key[2]] = dict(value)
+                else:
+                    records.pop(key[2], None)
+        return records
+
+    async def load_vote(self, user_id: int) -> float | None:
+        pending = self._pending.get(("vote", user_id))
+        if pending is not None:
+            return pending[2]["expires"]
+        row = await self._run(self._fetchone, "SELECT expires FROM votes WHERE user_id = ?", (user_id,))
+        return row[0] if row else None
+
+    async def save_vote(self, user_id: int, expires: float):
+        # Expired votes are only clutter; one delete per batch keeps the table to the live window.
+        self._pending[("vote_prune",)] = ("DELETE FROM votes WHERE expires < ?", (time.time(),), {})
+        await self._write(("vote", user_id), "INSERT OR REPLACE INTO votes (user_id, expires) VALUES (?, ?)",
+                          (user_id, expires), {"expires": expires})
+
+    async def flush(self):
+        self._start_flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    def close(self):
+        super().close()
+        self._conn.close()
+
+def migrate_json_to_sqlite(servers_dir: Path, db_path: Path, batch_guilds: int = 1000) -> tuple[int, int, int]:
+    """One-shot import of the servers/ tree into SQLite. Returns (guilds, boosters, votes) imported."""
+    conn = open_sqlite(db_path)
+    guilds = boosters = 0
+    configs: list[tuple] = []
+    users: list[tuple] = []
+
+    def commit():
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany("INSERT OR REPLACE INTO guild_configs (guild_id, data) VALUES (?, ?)", configs)
+            conn.executemany(
+                "INSERT OR REPLACE INTO boosters (guild_id, user_id, boost_start, name) VALUES (?, ?, ?, ?)", users
+            )
+        configs.clear()
+        users.clear()
+
+    try:
+        for gdir in servers_dir.iterdir() if servers_dir.exists() else ():
+            if not gdir.is_dir() or not gdir.name.isdigit():
+                continue
+            guild_id = int(gdir.name)
+            for f in gdir.glob("*.json"):
+                if not f.stem.isdigit():
+                    continue
+                try:
+                    data = _read_json_file(f) or {}
+                except Exception as e:
+                    log.warning("Skipping unreadable %s: %s", f, e)
+                    continue
+                if int(f.stem) == guild_id:
+                    configs.append((guild_id, json.dumps({**default_guild_config(), **data}, ensure_ascii=False)))
+                    guilds += 1
+                else:
+                    users.append((guild_id, int(f.stem), data.get("boost_start"), data.get("name")))
+                    boosters += 1
+            if len(configs) >= batch_guilds:
+                commit()
+        commit()
+
+        now = time.time()
+        live = []
+        votes_dir = servers_dir / "votes"
+        for f in votes_dir.glob("*.json") if votes_dir.exists() else ():
+            try:
+                expires = (_read_json_file(f) or {}).get("expires")
+            except Exception as e:
+                log.warning("Skipping unreadable %s: %s", f, e)
+                continue
+            if f.stem.isdigit() and isinstance(expires, (int, float)) and expires > now:
+                live.append((int(f.stem), expires))
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany("INSERT OR REPLACE INTO votes (user_id, expires) VALUES (?, ?)", live)
+    finally:
+        conn.close()
+    return guilds, boosters, len(live)
+
+def create_storage() -> StorageBackend:
+    if STORAGE_BACKEND == "sqlite":
+        return SqliteStorage(SQLITE_PATH)
+    if STORAGE_BACKEND != "json":
+        log.warning("Unknown STORAGE_BACKEND=%r, using json.", STORAGE_BACKEND)
+    return JsonStorage(SERVERS_DIR, max_workers=int(os.getenv("STORAGE_WORKERS", "4")))
+
+storage = create_storage()
+
+# --------------------------------------------------------------------------------------
+# Bulk export / import (one gzip'd JSON Lines archive for every guild)
+# --------------------------------------------------------------------------------------
+EXPORT_FORMAT = "nitroping-export"
+EXPORT_VERSION = 1
+
+def sqlite_records(db_path: Path):
+    """Every guild config, then every booster record, from one read transaction.
+
+    WAL readers see a fixed snapshot for the whole transaction, so the export is consistent
+    even while the bot keeps writing.
+    """
+    conn = open_sqlite(db_path)
+    try:
+        conn.execute("BEGIN")
+        for guild_id, data in conn.execute("SELECT guild_id, data FROM guild_configs ORDER BY guild_id"):
+            try:
+                config = json.loads(data)
+            except ValueError:
+                log.warning("Skipping unreadable config of guild %s", guild_id)
+                continue
+            yield {"type": "config", "guild_id": guild_id, "config": {**default_guild_config(), **config}}
+        for guild_id, user_id, start, name in conn.execute(
+            "SELECT guild_id, user_id, boost_start, name FROM boosters ORDER BY guild_id, user_id"
+        ):
+            yield {"type": "booster", "guild_id": guild_id, "user_id": user_id, "boost_start": start, "name": name}
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+def json_records(servers_dir: Path):
+    """Walk the servers/ tree one directory entry at a time. Each file is consistent on its
+    own (writes are atomic renames), but the tree as a whole is only consistent if the bot is stopped."""
+    if not servers_dir.exists():
+        return
+    with os.scandir(servers_dir) as guild_dirs:
+        for gdir in guild_dirs:
+            if not gdir.name.isdigit() or not gdir.is_dir():
+                continue
+            guild_id = int(gdir.name)
+            with os.scandir(gdir.path) as files:
+                for f in files:
+                    stem, ext = os.path.splitext(f.name)
+                    if ext != ".json" or not stem.isdigit():
+                        continue
+                    try:
+                        data = _read_json_file(Path(f.path)) or {}
+                    except Exception as e:
+                        log.warning("Skipping unreadable %s: %s", f.path, e)
+                        continue
+                    if int(stem) == guild_id:
+                        yield {"type": "config", "guild_id": guild_id, "config": {**default_guild_config(), **data}}
+                    else:
+                        yield {"type": "booster", "guild_id": guild_id, "user_id": int(stem),
+                               "boost_start": data.get("boost_start"), "name": data.get("name")}
+
+def export_archive(path: Path, records) -> tuple[int, int]:
+    """Stream ``records`` into a gzip'd JSON Lines archive at ``path``. Returns (guilds, boosters)."""
+    counts = {"config": 0, "booster": 0}
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+            f.write(dumps({"format": EXPORT_FORMAT, "version": EXPORT_VERSION, "created": UTCNOW().isoformat()}) + "\n")
+            for record in records:
+                counts[record["type"]] += 1
+                f.write(dumps(record) + "\n")
+            f.write(dumps({"type": "end", "guilds": counts["config"], "boosters": counts["booster"]}) + "\n")
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return counts["config"], counts["booster"]
+
+def read_archive(path: Path):
+    """Yield the config/booster records of an archive; raises ValueError for a foreign or truncated file."""
+    try:
+        yield from _archive_records(path)
+    except (OSError, EOFError, zlib.error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        # BadGzipFile is an OSError; a cut-off stream surfaces as EOFError mid-line.
+        raise ValueError(f"{path} is not a readable NitroPing export ({type(e).__name__}: {e})") from e
+
+def _valid_record(record) -> bool:
+    if not isinstance(record, dict) or not isinstance(record.get("guild_id"), int):
+        return False
+    if record.get("type") == "config":
+        return isinstance(record.get("config"), dict)
+    return isinstance(record.get("user_id"), int)
+
+def _archive_records(path: Path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline() or "null")
+        if not isinstance(header, dict) or header.get("format") != EXPORT_FORMAT:
+            raise ValueError(f"{path} is not a NitroPing export")
+        if header.get("version") != EXPORT_VERSION:
+            raise ValueError(f"unsupported export version {header.get('version')!r}")
+        counts = {"config": 0, "booster": 0}
+        for line in f:
+            record = json.loads(line)
+            kind = record.get("type") if isinstance(record, dict) else None
+            if kind == "end":
+                if (record.get("guilds"), record.get("boosters")) != (counts["config"], counts["booster"]):
+                    raise ValueError(f"{path} is incomplete: record counts don't match")
+                return
+            if kind not in counts:
+                raise ValueError(f"unknown record type {kind!r}")
+            if not _valid_record(record):
+                raise ValueError(f"malformed {kind} record in {path}")
+            counts[kind] += 1
+            yield record
+    raise ValueError(f"{path} is truncated")
+
+def import_archive_sqlite(path: Path, db_path: Path, batch: int = 5000) -> tuple[int, int]:
+    """Restore an archive into SQLite in one transaction: a bad archive changes nothing."""
+    conn = open_sqlite(db_path)
+    guilds = boosters = 0
+    configs: list[tuple] = []
+    users: list[tuple] = []
+
+    def write():
+        conn.executemany("INSERT OR REPLACE INTO guild_configs (guild_id, data) VALUES (?, ?)", configs)
+        conn.executemany(
+            "INSERT OR REPLACE INTO boosters (guild_id, user_id, boost_start, name) VALUES (?, ?, ?, ?)", users
         )
-    return cfg
+        configs.clear()
+        users.clear()
+
+    try:
+        with conn:
+            conn.execute("BEGIN")
+            for record in read_archive(path):
+                if record["type"] == "config":
+                    configs.append((record["guild_id"], json.dumps(record["config"], ensure_ascii=False)))
+                    guilds += 1
+                else:
+                    users.append((record["guild_id"], record["user_id"], record.get("boost_start"), record.get("name")))
+                    boosters += 1
+                if len(configs) + len(users) >= batch:
+                    write()
+            write()
+    finally:
+        conn.close()
+    return guilds, boosters
+
+def import_archive_json(path: Path, servers_dir: Path) -> tuple[int, int]:
+    """Restore an archive into the servers/ tree; stop the bot first.
+
+    The whole archive is read once before anything is written, so a truncated or foreign
+    file leaves the tree untouched. Every file is still replaced by a rename, but none is
+    fsynced on its own: one sync() at the end flushes them all, which is what makes 100k
+    guilds take seconds rather than minutes.
+    """
+    for _ in read_archive(path):
+        pass
+    guilds = boosters = 0
+    current = None
+    for record in read_archive(path):
+        guild_id = record["guild_id"]
+        gdir = os.path.join(servers_dir, str(guild_id))
+        if guild_id != current:  # records come grouped by guild
+            os.makedirs(gdir, exist_ok=True)
+            current = guild_id
+        if record["type"] == "config":
+            name, data = f"{guild_id}.json", record["config"]
+            guilds += 1
+        else:
+            name, data = f"{record['user_id']}.json", {"boost_start": record.get("boost_start"), "name": record.get("name")}
+            boosters += 1
+        tmp = os.path.join(gdir, f".{name}.import")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps(data, ensure_ascii=False))
+        os.replace(tmp, os.path.join(gdir, name))
+    if hasattr(os, "sync"):
+        os.sync()
+    return guilds, boosters
+
+# --------------------------------------------------------------------------------------
+# Guild config store (in-memory cache, write-through to servers/<gid>/<gid>.json)
+# --------------------------------------------------------------------------------------
+class GuildConfigStore:
+    """Loads each guild config once, serves reads from memory and writes changes through to disk.
+
+    Entries are kept in LRU order and evicted once the cache exceeds ``max_entries`` or an
+    entry has not been touched for ``ttl`` seconds, so memory stays bounded.
+    The returned dicts are shared: treat them as read-only and change them via ``update()``.
+    """
+
+    def __init__(self, storage: StorageBackend, max_entries: int = 5000, ttl: float = 3600.0):
+        self.storage = storage
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[int, tuple[dict, float]] = OrderedDict()
+        self._loading: dict[int, asyncio.Future] = {}
+        # Striped locks keep writes for one guild ordered without a lock object per guild.
+        self._write_locks = [asyncio.Lock() for _ in range(64)]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self, now: float):
+        # Oldest-touched entries sit at the front, so only the head ever needs checking.
+        while self._entries:
+            guild_id, (_, last_used) = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and now - last_used <= self.ttl:
+                break
+            self._entries.popitem(last=False)
+
+    async def get(self, guild_id: int) -> dict:
+        now = time.monotonic()
+        entry = self._entries.get(guild_id)
+        if entry is not None:
+            self._entries[guild_id] = (entry[0], now)
+            self._entries.move_to_end(guild_id)
+            self._evict(now)
+            return entry[0]
+
+        # Concurrent misses for the same guild share a single disk read.
+        pending = self._loading.get(guild_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        pending = asyncio.get_running_loop().create_future()
+        self._loading[guild_id] = pending
+        try:
+            config = await self.storage.load_guild_config(guild_id)
+        except Exception as e:
+            pending.set_exception(e)
+            pending.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._loading.pop(guild_id, None)
+        pending.set_result(config)
+
+        self._entries[guild_id] = (config, time.monotonic())
+        self._evict(now)
+        return config
+
+    async def update(self, guild_id: int, **changes) -> dict:
+        """Apply ``changes``, persist them, then swap the cached entry (disk first, so a failed write changes nothing)."""
+        async with self._write_locks[guild_id % len(self._write_locks)]:
+            config = {**await self.get(guild_id), **changes}
+            await self.storage.save_guild_config(guild_id, config)
+            self._entries[guild_id] = (config, time.monotonic())
+            self._entries.move_to_end(guild_id)
+            return config
+
+    def discard(self, guild_id: int):
+        self._entries.pop(guild_id, None)
+
+config_store = GuildConfigStore(
+    storage,
+    max_entries=int(os.getenv("CONFIG_CACHE_SIZE", "5000")),
+    ttl=float(os.getenv("CONFIG_CACHE_TTL", "3600")),
+)
+
+# --------------------------------------------------------------------------------------
+# Boost history (append-only binary log per guild, aggregated in memory)
+# --------------------------------------------------------------------------------------
+HISTORY_DIR = Path(os.getenv("HISTORY_DIR") or BASE_PATH / "history")
+HISTORY_COMPACT_INTERVAL = float(os.getenv("HISTORY_COMPACT_INTERVAL", "3600"))
+
+def _month(ts: float) -> int:
+    d = datetime.fromtimestamp(ts, tz=timezone.utc)
+    return d.year * 12 + d.month - 1
+
+class GuildBoostHistory:
+    """Aggregates over one guild's boost log: every query is a dict lookup or one pass over members."""
+
+    __slots__ = ("open", "seconds", "boosts", "months")
+
+    def __init__(self):
+        self.open: dict[int, float] = {}      # user_id -> start of the boost in progress
+        self.seconds: dict[int, float] = {}   # user_id -> seconds of finished boosts
+        self.boosts: dict[int, int] = {}      # user_id -> boosts started
+        self.months: dict[int, int] = {}      # year * 12 + month - 1 -> boosts started
+
+    def apply(self, kind: int, key: int, a: float, b: float):
+        if kind == BoostHistory.START:
+            if key not in self.open:
+                self.boosts[key] = self.boosts.get(key, 0) + 1
+                month = _month(a)
+                self.months[month] = self.months.get(month, 0) + 1
+            self.open[key] = a
+        elif kind == BoostHistory.STOP:
+            start = self.open.pop(key, b)
+            self.seconds[key] = self.seconds.get(key, 0.0) + max(0.0, a - start)
+        elif kind == BoostHistory.TOTAL:
+            self.seconds[key] = self.seconds.get(key, 0.0) + a
+            self.boosts[key] = self.boosts.get(key, 0) + int(b)
+        elif kind == BoostHistory.MONTH:
+            self.months[key] = self.months.get(key, 0) + int(a)
+        elif kind == BoostHistory.OPEN:
+            self.open[key] = a
+
+    def total_seconds(self, user_id: int, now: float) -> float:
+        start = self.open.get(user_id)
+        return self.seconds.get(user_id, 0.0) + (now - start if start is not None else 0.0)
+
+    def leaderboard(self, n: int, now: float) -> list[tuple[int, float]]:
+        """Top ``n`` members by total boost time (finished plus in progress), in seconds."""
+        members = self.seconds.keys() | self.open.keys()
+        return [(uid, self.total_seconds(uid, now)) for uid in heapq.nlargest(n, members, key=lambda u: self.total_seconds(u, now))]
+
+    def rank(self, user_id: int, now: float) -> int | None:
+        mine = self.total_seconds(user_id, now)
+        if not mine:
+            return None
+        return 1 + sum(1 for uid in self.seconds.keys() | self.open.keys() if self.total_seconds(uid, now) > mine)
+
+    def compacted(self) -> list[tuple[int, int, float, float]]:
+        """The smallest log with the same aggregates: one total per member, one count per month, open boosts."""
+        rows = [(BoostHistory.TOTAL, uid, self.seconds.get(uid, 0.0), float(self.boosts.get(uid, 0)))
+                for uid in self.seconds.keys() | self.boosts.keys()]
+        rows += [(BoostHistory.MONTH, month, float(count), 0.0) for month, count in self.months.items()]
+        # Open boosts are already counted in boosts/months, so they come back as STOP-less starts with no count.
+        rows += [(BoostHistory.OPEN, uid, start, 0.0) for uid, start in self.open.items()]
+        return rows
+
+class BoostHistory:
+    """Append-only boost start/stop log per guild (``HISTORY_DIR/<guild_id>.log``).
+
+    Records are fixed 25-byte structs appended on a single I/O thread, so they land in order.
+    A guild's log is read once, on first query, into a ``GuildBoostHistory`` that later
+    appends keep current. Logs that grew to twice their size since the last compaction are
+    rewritten as totals per member, counts per month and the boosts still open.
+
+    ``reconcile``, when set, is called with each freshly read ``GuildBoostHistory`` and returns
+    records to append, so the log agrees with who is boosting now (see ``NitroPing``).
+    """
+
+    START, STOP, TOTAL, MONTH, OPEN = range(1, 6)
+    _RECORD = struct.Struct("<BQdd")  # kind, user_id (or month), a, b
+
+    def __init__(self, root: Path, max_loaded: int = 1000, compact_min_bytes: int = 64 * 1024):
+        self.root = root
+        self.max_loaded = max_loaded
+        self.compact_min_bytes = compact_min_bytes
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nitroping-history")
+        self._loaded: OrderedDict[int, GuildBoostHistory] = OrderedDict()
+        self._loading: dict[int, asyncio.Future] = {}
+        self._backlog: dict[int, list[tuple]] = {}
+        self._dirty: set[int] = set()
+        self._compacted_size: dict[int, int] = {}
+        self._task: asyncio.Task | None = None
+        self.reconcile = None  # (guild_id, GuildBoostHistory) -> [record]
+
+    def path(self, guild_id: int) -> Path:
+        return self.root / f"{guild_id}.log"
+
+    # ---- writes ----
+    async def record_start(self, guild_id: int, user_id: int, start: float):
+        await self._append(guild_id, (self.START, user_id, start, 0.0))
+
+    async def record_stop(self, guild_id: int, user_id: int, stop: float, start: float):
+        await self._append(guild_id, (self.STOP, user_id, stop, start))
+
+    async def _append(self, guild_id: int, record: tuple):
+        loaded = self._loaded.get(guild_id)
+        if loaded is not None:
+            loaded.apply(*record)
+        elif guild_id in self._loading:
+            self._backlog.setdefault(guild_id, []).append(record)
+        self._dirty.add(guild_id)
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._write, guild_id, record)
+
+    def _write(self, guild_id: int, record: tuple):
+        path = self.path(guild_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("ab") as f:
+            f.write(self._RECORD.pack(*record))
+
+    # ---- reads ----
+    def is_loaded(self, guild_id: int) -> bool:
+        return guild_id in self._loaded
+
+    def unload(self, guild_id: int):
+        """Drop the in-memory copy; the next ``get`` re-reads (and re-reconciles) the log."""
+        self._loaded.pop(guild_id, None)
+
+    async def get(self, guild_id: int) -> GuildBoostHistory:
+        loaded = self._loaded.get(guild_id)
+        if loaded is not None:
+            self._loaded.move_to_end(guild_id)
+            return loaded
+        pending = self._loading.get(guild_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        loop = asyncio.get_running_loop()
+        future = self._loading[guild_id] = loop.create_future()
+        try:
+            loaded = await loop.run_in_executor(self._executor, self._read, guild_id)
+            for record in self._backlog.pop(guild_id, ()):
+                loaded.apply(*record)
+            self._loaded[guild_id] = loaded
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+            for record in self.reconcile(guild_id, loaded) if self.reconcile is not None else ():
+                loaded.apply(*record)
+                self._dirty.add(guild_id)
+                await loop.run_in_executor(self._executor, self._write, guild_id, record)
+            future.set_result(loaded)
+            return loaded
+        except BaseException as e:
+            self._backlog.pop(guild_id, None)
+            future.set_exception(e)
+            future.exception()  # retrieved: nobody else may be waiting
+            raise
+        finally:
+            del self._loading[guild_id]
+
+    def _read(self, guild_id: int) -> GuildBoostHistory:
+        history = GuildBoostHistory()
+        try:
+            blob = self.path(guild_id).read_bytes()
+        except FileNotFoundError:
+            return history
+        size = self._RECORD.size
+        end = len(blob) - len(blob) % size  # ignore a torn final record
+        apply = history.apply
+        for record in self._RECORD.iter_unpack(blob[:end]):
+            apply(*record)
+        return history
+
+    # ---- compaction ----
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(HISTORY_COMPACT_INTERVAL)
+            dirty, self._dirty = self._dirty, set()
+            for guild_id in dirty:
+                try:
+                    await self.compact(guild_id)
+                except Exception:
+                    log.exception("Boost history compaction failed", extra={"guild_id": guild_id, "event": "history_compact"})
+
+    async def compact(self, guild_id: int, force: bool = False) -> bool:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._compact, guild_id, force)
+
+    def _compact(self, guild_id: int, force: bool) -> bool:
+        path = self.path(guild_id)
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return False
+        if not force and (size < self.compact_min_bytes or size < 2 * self._compacted_size.get(guild_id, 0)):
+            return False
+        rows = self._read(guild_id).compacted()
+        _write_bytes_file(path, b"".join(self._RECORD.pack(*row) for row in rows))
+        self._compacted_size[guild_id] = len(rows) * self._RECORD.size
+        return True
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+        # Let queued appends finish before the process exits.
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown, True)
+
+history = BoostHistory(HISTORY_DIR)
+
+# --------------------------------------------------------------------------------------
+# Booster index (per guild, ordered by premium_since)
+# --------------------------------------------------------------------------------------
+class BoosterIndex:
+    """Boosters of one guild sorted by boost start (oldest first).
+
+    Built once from the member cache when the guild becomes available, then kept current
+    from member events, so pages are plain slices instead of scans over ``guild.members``.
+    """
+
+    __slots__ = ("_keys", "_since", "names", "version")
+
+    def __init__(self):
+        self._keys: list[tuple[float, int]] = []  # (premium_since timestamp, user_id)
+        self._since: dict[int, float] = {}
+        self.names: dict[int, str] = {}
+        self.version = 0  # bumped on every change; stale /boosters pages can tell
+
+    @classmethod
+    def from_members(cls, members) -> "BoosterIndex":
+        index = cls()
+        for m in members:
+            if m.premium_since:
+                index._since[m.id] = m.premium_since.timestamp()
+                index.names[m.id] = m.display_name
+        index._keys = sorted((ts, uid) for uid, ts in index._since.items())
+        return index
+
+    def merge_records(self, records: dict[int, dict]):
+        """Add persisted booster records for members that are not in the member cache."""
+        for user_id, data in records.items():
+            if user_id in self._since:
+                continue
+            try:
+                ts = datetime.fromisoformat(data["boost_start"]).timestamp()
+            except Exception:
+                continue
+            self._since[user_id] = ts
+            self.names[user_id] = data.get("name") or str(user_id)
+            bisect.insort(self._keys, (ts, user_id))
+            self.version += 1
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._since
+
+    def __iter__(self):
+        return iter(self._since)
+
+    def timestamps(self) -> dict[int, float]:
+        return dict(self._since)
+
+    def add(self, user_id: int, premium_since: datetime, name: str):
+        self.remove(user_id)
+        ts = premium_since.timestamp()
+        self._since[user_id] = ts
+        self.names[user_id] = name
+        bisect.insort(self._keys, (ts, user_id))
+        self.version += 1
+
+    def remove(self, user_id: int):
+        ts = self._since.pop(user_id, None)
+        self.names.pop(user_id, None)
+        if ts is None:
+            return
+        i = bisect.bisect_left(self._keys, (ts, user_id))
+        if i < len(self._keys) and self._keys[i] == (ts, user_id):
+            del self._keys[i]
+        self.version += 1
+
+    def since(self, user_id: int) -> datetime | None:
+        ts = self._since.get(user_id)
+        return datetime.fromtimestamp(ts, tz=timezone.utc) if ts is not None else None
+
+    def update_member(self, member: discord.Member):
+        if member.premium_since:
+            self.add(member.id, member.premium_since, member.display_name)
+        else:
+            self.remove(member.id)
+
+    def page_count(self, page_size: int) -> int:
+        return max(1, -(-len(self._keys) // page_size))
+
+    def page(self, page: int, page_size: int) -> list[tuple[int, float, str]]:
+        """(user_id, premium_since timestamp, display name) for one page."""
+        start = page * page_size
+        return [(uid, ts, self.names.get(uid, str(uid))) for ts, uid in self._keys[start:start + page_size]]
 
 def admin_only(func):
     func = app_commands.default_permissions(administrator=True)(func)
     func = app_commands.checks.has_permissions(administrator=True)(func)
     return func
 
-def resolve_announce_channel(bot: commands.Bot, guild: discord.Guild, config: dict) -> discord.abc.Messageable | None:
-    """Prefer configured channel; else fallback to system channel if present."""
-    channel = None
-    channel_id = config.get("channel_id")
-    if channel_id:
-        channel = bot.get_channel(int(channel_id))
+# --------------------------------------------------------------------------------------
+# Manageable role index (per guild, kept current by role events; backs /set_roles)
+# --------------------------------------------------------------------------------------
+class RoleIndex:
+    """Roles of one guild the bot can hand out: not @everyone, not integration-managed and
+    below the bot's top role.
+
+    Built once per guild on first use and kept current by role create/update/delete events
+    and by changes to the bot's own roles, so searches never walk ``guild.roles``. Names
+    are kept casefolded and sorted, so a prefix search is a bisect; substring matches
+    come after the prefix matches.
+    """
+
+    __slots__ = ("guild", "_names", "_by_name", "_by_position")
+
+    def __init__(self, guild: discord.Guild):
+        self.guild = guild
+        self._names: dict[int, str] = {}
+        self.rebuild()
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, role_id: int) -> bool:
+        return role_id in self._names
+
+    @staticmethod
+    def manageable(role: discord.Role, top: discord.Role | None) -> bool:
+        return top is not None and not role.is_default() and not role.managed and role < top
+
+    def rebuild(self):
+        me = self.guild.me
+        top = me.top_role if me is not None else None
+        self._names = {r.id: r.name.casefold() for r in self.guild.roles if self.manageable(r, top)}
+        self._invalidate()
+
+    def update(self, role: discord.Role):
+        me = self.guild.me
+        if self.manageable(role, me.top_role if me is not None else None):
+            self._names[role.id] = role.name.casefold()
+        else:
+            self._names.pop(role.id, None)
+        self._invalidate()
+
+    def remove(self, role_id: int):
+        if self._names.pop(role_id, None) is not None:
+            self._invalidate()
+
+    def _invalidate(self):
+        self._by_name = None      # [(casefolded name, role_id)], sorted; built on first search
+        self._by_position = None  # [role_id], highest first; built on first ordered()
+
+    def _roles(self, ids) -> list[discord.Role]:
+        get = self.guild.get_role
+        return [role for role in map(get, ids) if role is not None]
+
+    def ordered(self) -> list[discord.Role]:
+        """Every manageable role, highest first (the order of the server's role list)."""
+        if self._by_position is None:
+            self._by_position = [r.id for r in sorted(self._roles(self._names), key=lambda r: r.position, reverse=True)]
+        return self._roles(self._by_position)
+
+    def search(self, query: str, limit: int | None = 25) -> list[discord.Role]:
+        """Roles whose name starts with ``query`` (alphabetical), then those that contain it."""
+        query = query.strip().casefold()
+        if not query:
+            return self.ordered()[:limit]
+        if self._by_name is None:
+            self._by_name = sorted((name, rid) for rid, name in self._names.items())
+        by_name = self._by_name
+        ids = []
+        i = bisect.bisect_left(by_name, (query,))
+        while i < len(by_name) and by_name[i][0].startswith(query) and (limit is None or len(ids) < limit):
+            ids.append(by_name[i][1])
+            i += 1
+        if limit is None or len(ids) < limit:
+            prefixed = set(ids)
+            for name, rid in by_name:
+                if query in name and rid not in prefixed:
+                    ids.append(rid)
+                    if limit is not None and len(ids) >= limit:
+                        break
+        return self._roles(ids)
+
+# --------------------------------------------------------------------------------------
+# Channel resolution (TTL cache for fetched channels, negative cache for 404/403)
+# --------------------------------------------------------------------------------------
+class ChannelResolver:
+    """Resolves announcement channels without repeating REST calls.
+
+    Channels in the gateway cache are used directly. Channels that had to be fetched are kept
+    for ``ttl`` seconds, and ids that came back 404/403 (or refused a send) are remembered for
+    ``negative_ttl`` seconds, so a broken config costs no REST calls per event. Entries are
+    dropped by ``on_guild_channel_delete``/``on_guild_channel_update``.
+    """
+
+    def __init__(self, bot: commands.Bot, ttl: float = 300.0, negative_ttl: float = 600.0, max_entries: int = 10000):
+        self.bot = bot
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._fetched: OrderedDict[int, tuple[discord.abc.GuildChannel, float]] = OrderedDict()
+        self._missing: OrderedDict[int, float] = OrderedDict()
+        self._inflight: dict[int, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "negative_hits": self.negative_hits,
+                "fetched": len(self._fetched), "missing": len(self._missing)}
+
+    def _remember(self, cache: OrderedDict, key: int, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.max_entries:
+            cache.popitem(last=False)
+
+    def mark_broken(self, channel_id: int):
+        """Negative-cache a channel the bot cannot use (e.g. a send came back 403)."""
+        self._fetched.pop(channel_id, None)
+        self._remember(self._missing, channel_id, time.monotonic() + self.negative_ttl)
+
+    def invalidate(self, channel_id: int):
+        self._fetched.pop(channel_id, None)
+        self._missing.pop(channel_id, None)
+
+    async def get(self, channel_id: int) -> discord.abc.Messageable | None:
+        now = time.monotonic()
+        expires = self._missing.get(channel_id)
+        if expires is not None:
+            if now < expires:
+                self.negative_hits += 1
+                return None
+            del self._missing[channel_id]
+
+        channel = self.bot.get_channel(channel_id)
+        if channel is not None:
+            self.hits += 1
+            return channel
+        entry = self._fetched.get(channel_id)
+        if entry is not None:
+            if now < entry[1]:
+                self.hits += 1
+                return entry[0]
+            del self._fetched[channel_id]
+
+        # Concurrent misses for the same channel share one fetch.
+        pending = self._inflight.get(channel_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        self.misses += 1
+        pending = self._inflight[channel_id] = asyncio.get_running_loop().create_future()
+        channel = None
+        try:
+            channel = await self.bot.fetch_channel(channel_id)
+            self._remember(self._fetched, channel_id, (channel, time.monotonic() + self.ttl))
+        except (discord.NotFound, discord.Forbidden):
+            self.mark_broken(channel_id)
+        except discord.HTTPException:
+            pass  # transient; don't cache
+        finally:
+            self._inflight.pop(channel_id, None)
+            pending.set_result(channel)
+        return channel
+
+    async def resolve(self, guild: discord.Guild, config: dict) -> discord.abc.Messageable | None:
+        """Prefer configured channel; else fallback to system channel if present."""
+        channel = None
+        channel_id = config.get("channel_id")
+        if channel_id:
+            channel = await self.get(int(channel_id))
         if channel is None:
+            channel = guild.system_channel
+        return channel
+
+# --------------------------------------------------------------------------------------
+# Announcement queue (one worker per target channel, coalesces boost bursts)
+# --------------------------------------------------------------------------------------
+ANNOUNCE_WINDOW = float(os.getenv("ANNOUNCE_WINDOW", "2"))
+
+class Announcement:
+    """One queued announcement. ``embed`` is what goes out when it is not merged with others."""
+
+    BOOST = "boost"            # a member started boosting
+    UNBOOST = "unboost"        # a member stopped boosting
+    GUILD_BOOST = "guild_boost"  # boost count went up without a member event
+    MILESTONE = "milestone"    # a member has been boosting for a month, six months, a year
+    OTHER = "other"
+
+    __slots__ = ("kind", "embed", "mention", "count", "template")
+
+    def __init__(self, kind: str, embed: discord.Embed, mention: str | None = None,
+                 count: int = 1, template: MessageTemplate | None = None):
+        self.kind = kind
+        self.embed = embed
+        self.mention = mention
+        self.count = count
+        self.template = template or template_for(DEFAULT_MESSAGE)
+
+class _ChannelQueue:
+    __slots__ = ("guild", "config", "queue", "sent", "worker")
+
+    def __init__(self, guild: discord.Guild, config: dict, maxsize: int):
+        self.guild = guild
+        self.config = config
+        self.queue: asyncio.Queue[Announcement] = asyncio.Queue(maxsize=maxsize)
+        self.sent: deque[float] = deque()
+        self.worker: asyncio.Task | None = None
+
+class AnnouncementQueue:
+    """Decouples announcing from event handlers.
+
+    ``submit()`` never awaits. Each target channel gets its own worker that waits ``window``
+    seconds after the first item, merges what arrived meanwhile ("3 new boosts from A, B, C")
+    and paces sends to ``rate`` messages per ``per`` seconds, Discord's per-channel budget.
+    Workers exit after ``idle_timeout`` seconds without work.
+    """
+
+    def __init__(self, bot: commands.Bot, window: float = 2.0, rate: int = 5, per: float = 5.0,
+                 maxsize: int = 500, idle_timeout: float = 60.0):
+        self.bot = bot
+        self.window = window
+        self.rate = rate
+        self.per = per
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self._channels: dict[int, _ChannelQueue] = {}
+        self.dropped = 0
+
+    def depth(self) -> int:
+        return sum(q.queue.qsize() for q in self._channels.values())
+
+    async def join(self):
+        """Wait until everything submitted so far has been delivered (or given up on)."""
+        await asyncio.gather(*(q.queue.join() for q in list(self._channels.values())))
+
+    def submit(self, guild: discord.Guild, config: dict, item: Announcement) -> bool:
+        channel_id = config.get("channel_id") or (guild.system_channel.id if guild.system_channel else None)
+        if not channel_id:
+            return False
+        key = int(channel_id)
+        state = self._channels.get(key)
+        if state is None:
+            state = self._channels[key] = _ChannelQueue(guild, config, self.maxsize)
+            state.worker = asyncio.get_running_loop().create_task(self._run(key, state))
+        state.guild, state.config = guild, config
+        try:
+            state.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        return True
+
+    async def _run(self, key: int, state: _ChannelQueue):
+        loop = asyncio.get_running_loop()
+        while True:
             try:
-                # Try fetching if not cached
-                channel = bot.loop.create_task(bot.fetch_channel(int(channel_id)))  # will be awaited when used
+                first = await asyncio.wait_for(state.queue.get(), timeout=self.idle_timeout)
+            except asyncio.TimeoutError:
+                if state.queue.empty():
+                    # No await between the check and the pop, so submit() can't slip an item in.
+                    if self._channels.get(key) is state:
+                        del self._channels[key]
+                    return
+                continue
+
+            batch = [first]
+            deadline = loop.time() + self.window
+            while (remaining := deadline - loop.time()) > 0:
+                try:
+                    batch.append(await asyncio.wait_for(state.queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+            while not state.queue.empty():
+                batch.append(state.queue.get_nowait())
+
+            try:
+                await self._deliver(state, batch)
             except Exception:
-                channel = None
-    if channel is None:
-        channel = guild.system_channel
-    return channel
+                log.exception("Error delivering announcements", extra={"guild_id": state.guild.id, "channel_id": key, "event": "announce"})
+            finally:
+                for _ in batch:
+                    state.queue.task_done()
+
+    async def _throttle(self, state: _ChannelQueue):
+        loop = asyncio.get_running_loop()
+        while len(state.sent) >= self.rate:
+            wait = state.sent[0] + self.per - loop.time()
+            if wait <= 0:
+                state.sent.popleft()
+            else:
+                await asyncio.sleep(wait)
+        state.sent.append(loop.time())
+
+    async def _deliver(self, state: _ChannelQueue, batch: list[Announcement]):
+        with rest_priority(RestScheduler.ANNOUNCE):
+            channel = await self.bot.channels.resolve(state.guild, state.config)
+            if channel is None:
+                return
+
+            for embed in self._merge(state.guild, batch):
+                await self._throttle(state)
+                try:
+                    await channel.send(embed=embed)
+                except RestShed as e:
+                    log.warning("Dropped announcement: %s", e, extra={"guild_id": state.guild.id, "channel_id": channel.id, "event": "announce"})
+                    return
+                except discord.Forbidden as e:
+                    self.bot.channels.mark_broken(channel.id)
+                    log.warning("Failed to announce: %s", e, extra={"guild_id": state.guild.id, "channel_id": channel.id, "event": "announce"})
+                    return
+                except discord.HTTPException as e:
+                    log.warning("Failed to announce: %s", e, extra={"guild_id": state.guild.id, "channel_id": channel.id, "event": "announce"})
+
+    def _merge(self, guild: discord.Guild, batch: list[Announcement]) -> list[discord.Embed]:
+        """Collapse each run of same-kind member boosts/unboosts into one embed, keeping order."""
+        embeds: list[discord.Embed] = []
+        run: list[Announcement] = []
+
+        def flush():
+            if len(run) == 1:
+                embeds.append(run[0].embed)
+            elif run:
+                embeds.append(self._merged_embed(guild, run))
+            run.clear()
+
+        for item in batch:
+            if run and (item.kind != run[0].kind or item.kind not in (Announcement.BOOST, Announcement.UNBOOST)):
+                flush()
+            run.append(item)
+        flush()
+        return embeds
+
+    def _merged_embed(self, guild: discord.Guild, items: list[Announcement]) -> discord.Embed:
+        bot = self.bot
+        mentions = ", ".join(i.mention for i in items if i.mention)
+        if items[0].kind == Announcement.BOOST:
+            count = sum(i.count for i in items)
+            title = f"{bot.boost_emoji} {count} New Server Boosts! {bot.boost_emoji}"
+            description = f"**{count}** new boosts from {mentions}! {items[-1].template.render_for(guild, mentions)}"
+        else:
+            title = f"{bot.boost_emoji} Server Boost Update {bot.boost_emoji}"
+            description = f"{mentions} stopped boosting the server. Thank you for your support!"
+        return bot.embeds.make(title, description, thumbnail=guild.icon)
+
+    async def close(self):
+        for state in list(self._channels.values()):
+            if state.worker is not None:
+                state.worker.cancel()
+        self._channels.clear()
+
+# --------------------------------------------------------------------------------------
+# Boost correlation (member-level vs guild-level boost events)
+# --------------------------------------------------------------------------------------
+BOOST_CORRELATION_WINDOW = float(os.getenv("BOOST_CORRELATION_WINDOW", "5"))
+# A member update for an unknown booster only counts as a new boost if premium_since is this recent.
+NEW_BOOST_GRACE = float(os.getenv("NEW_BOOST_GRACE", "120"))
+
+class BoostCorrelator:
+    """Matches ``on_member_update`` boost starts with ``premium_subscription_count`` increases.
+
+    One real boost fires both events, in either order. A member boost leaves a credit that a
+    later count increase consumes; a count increase that finds no credit is held as pending
+    for ``window`` seconds so a late member event can still claim it. Whatever is left
+    pending after the window was genuinely missed and goes to the backup announcer.
+    """
+
+    def __init__(self, window: float = 5.0):
+        self.window = window
+        self._credits: dict[int, deque[float]] = {}
+        self._pending: dict[int, deque[list]] = {}  # guild_id -> [[timestamp, unmatched count], ...]
+        self.suppressed = 0
+
+    def member_boost(self, guild_id: int):
+        now = time.monotonic()
+        pending = self._pending.get(guild_id)
+        if pending:
+            pending[0][1] -= 1
+            self.suppressed += 1
+            if pending[0][1] <= 0:
+                pending.popleft()
+            if not pending:
+                del self._pending[guild_id]
+            return
+        credits = self._credits.setdefault(guild_id, deque())
+        credits.append(now)
+
+    def guild_gain(self, guild_id: int, gained: int) -> int:
+        """Record a count increase; returns how many boosts are still unaccounted for."""
+        now = time.monotonic()
+        credits = self._credits.get(guild_id)
+        while credits and gained > 0:
+            if now - credits.popleft() <= self.window:
+                gained -= 1
+                self.suppressed += 1
+        if credits is not None and not credits:
+            del self._credits[guild_id]
+        if gained > 0:
+            self._pending.setdefault(guild_id, deque()).append([now, gained])
+        return gained
+
+    def take_missed(self, guild_id: int) -> int:
+        """Pop pending increases older than the window; nothing claimed them."""
+        now = time.monotonic()
+        pending = self._pending.get(guild_id)
+        missed = 0
+        while pending and now - pending[0][0] >= self.window:
+            missed += pending.popleft()[1]
+        if pending is not None and not pending:
+            del self._pending[guild_id]
+        return missed
+
+    def forget(self, guild_id: int):
+        self._credits.pop(guild_id, None)
+        self._pending.pop(guild_id, None)
+
+# --------------------------------------------------------------------------------------
+# Booster roles (single member edit per event + periodic reconciliation)
+# --------------------------------------------------------------------------------------
+RECONCILE_INTERVAL = float(os.getenv("RECONCILE_INTERVAL", "21600"))
+RECONCILE_CONCURRENCY = int(os.getenv("RECONCILE_CONCURRENCY", "2"))
+RECONCILE_RATE = float(os.getenv("RECONCILE_RATE", "1"))  # role edits per second, all guilds combined
+
+def booster_roles(guild: discord.Guild, config: dict) -> list[discord.Role]:
+    """Configured booster roles that still exist and that the bot can assign."""
+    me = guild.me
+    roles = []
+    for role_id in config.get("roles", []):
+        role = guild.get_role(int(role_id))
+        if role and not role.managed and (me is None or role < me.top_role):
+            roles.append(role)
+    return roles
+
+async def apply_booster_roles(member: discord.Member, roles: list[discord.Role], boosting: bool, reason: str) -> bool:
+    """Grant or revoke ``roles`` with at most one member edit. Returns True if an edit was sent."""
+    current = {r.id for r in member.roles}
+    if boosting:
+        changed = [r for r in roles if r.id not in current]
+        if not changed:
+            return False
+        new_roles = member.roles[1:] + changed
+    else:
+        drop = {r.id for r in roles} & current
+        if not drop:
+            return False
+        new_roles = [r for r in member.roles[1:] if r.id not in drop]
+    try:
+        await member.edit(roles=new_roles, reason=reason)
+    except discord.Forbidden:
+        return False
+    return True
+
+class RestBudget:
+    """Token bucket that spaces background REST calls out to ``rate`` per second."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class RoleReconciler:
+    """Diffs each guild's boosters against holders of its booster roles and fixes the drift.
+
+    Catches role changes missed while the bot was offline. Runs after the first READY and then
+    every ``interval`` seconds, with at most ``concurrency`` guilds in flight and role edits
+    paced by a shared ``RestBudget`` and queued at background priority, so live traffic goes first.
+    """
+
+    def __init__(self, bot: "NitroPing", interval: float, concurrency: int, rate: float):
+        self.bot = bot
+        self.interval = interval
+        self.budget = RestBudget(rate)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._task: asyncio.Task | None = None
+        self.fixed = 0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = self.bot.loop.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _run(self):
+        await self.bot.wait_until_ready()
+        while not self.bot.is_closed():
+            started = time.monotonic()
+            fixed = await self.reconcile_all()
+            log.info("Role reconciliation: %d member(s) fixed in %.1fs.", fixed, time.monotonic() - started, extra={"event": "reconcile"})
+            await asyncio.sleep(self.interval)
+
+    async def reconcile_all(self) -> int:
+        results = await asyncio.gather(*(self._guarded(g) for g in list(self.bot.guilds)))
+        return sum(results)
+
+    async def _guarded(self, guild: discord.Guild) -> int:
+        async with self._semaphore:
+            try:
+                return await self.reconcile_guild(guild)
+            except Exception:
+                log.exception("Role reconciliation failed", extra={"guild_id": guild.id, "event": "reconcile"})
+                return 0
+
+    async def reconcile_guild(self, guild: discord.Guild) -> int:
+        if guild.unavailable:
+            return 0
+        roles = booster_roles(guild, await config_store.get(guild.id))
+        if not roles:
+            return 0
+        boosters = set(self.bot.booster_index(guild))
+        role_ids = {r.id for r in roles}
+
+        drift: dict[int, tuple[discord.Member, bool]] = {}
+        if LOW_MEMORY:
+            # role.members only sees the cache, which holds almost nobody here.
+            holders = await self._fetch_role_holders(guild, role_ids)
+        else:
+            holders = [member for role in roles for member in role.members]
+        for member in holders:
+            if member.id not in boosters:
+                drift[member.id] = (member, False)
+        members, uncached = [], []
+        for user_id in boosters:
+            member = guild.get_member(user_id)
+            if member is None:
+                uncached.append(user_id)
+            else:
+                members.append(member)
+        # LOW_MEMORY keeps boosters out of the cache: look them up by id (gateway, not REST).
+        for i in range(0, len(uncached), 100):
+            try:
+                members += await guild.query_members(user_ids=uncached[i:i + 100], limit=100, cache=False)
+            except asyncio.TimeoutError:
+                log.warning("Timed out looking up boosters for reconciliation", extra={"guild_id": guild.id, "event": "reconcile"})
+        for member in members:
+            if not role_ids <= {r.id for r in member.roles}:
+                drift[member.id] = (member, True)
+
+        fixed = shed = 0
+        queue = deque((member, boosting, 0) for member, boosting in drift.values())
+        with rest_priority(RestScheduler.BACKGROUND):
+            while queue:
+                member, boosting, attempts = queue.popleft()
+                await self.budget.acquire()
+                try:
+                    if await apply_booster_roles(member, roles, boosting, reason="Booster role reconciliation"):
+                        fixed += 1
+                except RestShed:
+                    # Live traffic has the budget: try this member again after the rest of the guild.
+                    if attempts < 2:
+                        queue.append((member, boosting, attempts + 1))
+                    else:
+                        shed += 1
+        if shed:
+            log.info("Role reconciliation left %d member(s) for the next pass.", shed, extra={"guild_id": guild.id, "event": "reconcile"})
+        self.fixed += fixed
+        return fixed
+
+    async def _fetch_role_holders(self, guild: discord.Guild, role_ids: set[int]) -> list[discord.Member]:
+        """Members holding any of ``role_ids``, paged over REST 1000 at a time on the reconciliation budget."""
+        holders = []
+        after = None
+        attempts = 0
+        with rest_priority(RestScheduler.BACKGROUND):
+            while True:
+                await self.budget.acquire()
+                try:
+                    page = [m async for m in guild.fetch_members(limit=1000, after=after)]
+                except RestShed:
+                    attempts += 1
+                    if attempts > 2:
+                        # A partial list is still correct to act on: it only holds real role holders.
+                        log.info("Role reconciliation stopped listing members early.", extra={"guild_id": guild.id, "event": "reconcile"})
+                        break
+                    continue
+                attempts = 0
+                holders += [m for m in page if not role_ids.isdisjoint(r.id for r in m.roles)]
+                if len(page) < 1000:
+                    break
+                after = discord.Object(id=page[-1].id)
+        return holders
+
+# --------------------------------------------------------------------------------------
+# Booster snapshot (boost changes that happened while the bot was offline)
+# --------------------------------------------------------------------------------------
+SNAPSHOT_PATH = Path(os.getenv("SNAPSHOT_PATH") or BASE_PATH / "boosters.snapshot")
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "300"))
+
+class BoosterSnapshot:
+    """Per-guild boost counts plus booster ids and ``premium_since``, kept on disk across restarts.
+
+    Written every ``interval`` seconds and at shutdown. When a guild becomes available after a
+    restart, its entry is diffed against the fresh guild data and every boost that started or
+    stopped in between is dispatched as a ``member_update``, so it is announced and its roles
+    are fixed like a live event. Without a full member cache (LOW_MEMORY) only guilds whose boost
+    count changed are looked at: a drop re-queries the known boosters by id, a rise chunks that
+    one guild.
+    """
+
+    MAGIC = b"NPSNAP1\n"
+    _GUILD = struct.Struct("<QII")   # guild_id, premium_subscription_count, booster count
+    _BOOSTER = struct.Struct("<Qd")  # user_id, premium_since timestamp
+
+    def __init__(self, bot: "NitroPing", path: Path, interval: float):
+        self.bot = bot
+        self.path = path
+        self.interval = interval
+        # Entries from the previous run for guilds that have not been caught up yet.
+        self.previous: dict[int, tuple[int, dict[int, float]]] = {}
+        self.loaded = False
+        self.written_at: float | None = None  # mtime of the loaded file: the previous run was alive until then
+        self._task: asyncio.Task | None = None
+        self.caught_up = 0
+
+    @classmethod
+    def encode(cls, entries: dict[int, tuple[int, dict[int, float]]]) -> bytes:
+        parts = [cls.MAGIC]
+        for guild_id, (count, boosters) in entries.items():
+            parts.append(cls._GUILD.pack(guild_id, count, len(boosters)))
+            parts.extend(cls._BOOSTER.pack(uid, ts) for uid, ts in boosters.items())
+        return b"".join(parts)
+
+    @classmethod
+    def decode(cls, blob: bytes) -> dict[int, tuple[int, dict[int, float]]]:
+        if not blob.startswith(cls.MAGIC):
+            raise ValueError("not a booster snapshot")
+        entries = {}
+        offset = len(cls.MAGIC)
+        while offset < len(blob):
+            guild_id, count, n = cls._GUILD.unpack_from(blob, offset)
+            offset += cls._GUILD.size
+            boosters = dict(cls._BOOSTER.iter_unpack(blob[offset:offset + n * cls._BOOSTER.size]))
+            offset += n * cls._BOOSTER.size
+            entries[guild_id] = (count, boosters)
+        return entries
+
+    def load(self):
+        try:
+            self.written_at = self.path.stat().st_mtime
+            self.previous = self.decode(self.path.read_bytes())
+            shard_ids, shard_count = self.bot.shard_ids, self.bot.shard_count
+            if shard_ids is not None and shard_count:
+                # After a reshard the file can name guilds another cluster now owns.
+                mine = set(shard_ids)
+                self.previous = {gid: entry for gid, entry in self.previous.items() if (gid >> 22) % shard_count in mine}
+        except FileNotFoundError:
+            self.previous = {}
+        except Exception as e:
+            log.warning("Ignoring unreadable booster snapshot %s: %s", self.path, e)
+            self.previous = {}
+        self.loaded = True
+
+    def collect(self) -> dict[int, tuple[int, dict[int, float]]]:
+        # Guilds not seen yet this run keep their old entry instead of being forgotten.
+        entries = dict(self.previous)
+        for guild_id, index in self.bot._booster_index.items():
+            entries[guild_id] = (self.bot._boost_counts.get(guild_id, 0), index.timestamps())
+        return entries
+
+    async def write(self):
+        if not self.loaded:
+            return  # never replace a snapshot we have not read yet
+        blob = self.encode(self.collect())
+        await asyncio.to_thread(_write_bytes_file, self.path, blob)
+
+    def forget(self, guild_id: int):
+        self.previous.pop(guild_id, None)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = self.bot.loop.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _run(self):
+        while not self.bot.is_closed():
+            await asyncio.sleep(self.interval)
+            try:
+                await self.write()
+            except Exception:
+                log.exception("Could not write booster snapshot", extra={"event": "snapshot"})
+
+    async def catch_up(self, guild: discord.Guild) -> int:
+        """Dispatch the boost changes since the snapshot for ``guild``. Returns the number of events."""
+        entry = self.previous.pop(guild.id, None)
+        if entry is None:
+            return 0
+        old_count, old = entry
+        count = self.bot._boost_counts.get(guild.id, 0)
+
+        if not LOW_MEMORY:
+            members = {m.id: m for m in guild.members}
+        elif count == old_count:
+            return 0
+        elif count > old_count:
+            members = {m.id: m for m in await guild.chunk(cache=False)}
+        else:
+            ids = list(old)
+            members = {}
+            for i in range(0, len(ids), 100):
+                found = await guild.query_members(user_ids=ids[i:i + 100], limit=100, cache=False)
+                members.update((m.id, m) for m in found)
+
+        events = 0
+        for user_id, member in members.items():
+            since = member.premium_since
+            if since is None:
+                continue
+            ts = old.get(user_id)
+            if ts is None or abs(since.timestamp() - ts) > 1:
+                before = discord.Member._copy(member)
+                before.premium_since = None
+                self.bot.dispatch("member_update", before, member)
+                events += 1
+
+        index = self.bot.booster_index(guild)
+        for user_id, ts in old.items():
+            member = members.get(user_id)
+            if member is not None and member.premium_since is not None:
+                continue
+            if member is None:
+                # Left the guild while we were away: nothing to announce, just drop the record.
+                index.remove(user_id)
+                self.bot.milestones.cancel(guild.id, user_id)
+                user_data = await storage.load_user(guild.id, user_id)
+                if user_data and user_data.get("boost_start"):
+                    user_data["boost_start"] = None
+                    await storage.save_user(guild.id, user_id, user_data)
+                await history.record_stop(guild.id, user_id, time.time(), ts)
+                continue
+            before = discord.Member._copy(member)
+            before.premium_since = datetime.fromtimestamp(ts, tz=timezone.utc)
+            self.bot.dispatch("member_update", before, member)
+            events += 1
+
+        self.caught_up += events
+        return events
+
+# --------------------------------------------------------------------------------------
+# Boost milestones (one timer heap for every booster of every guild)
+# --------------------------------------------------------------------------------------
+MILESTONES = ((30, "1 month"), (182, "6 months"), (365, "1 year"))
+MILESTONE_GRACE = 86400.0  # milestones found overdue by more than this (bot was asleep) are skipped
+
+def next_milestone(start: float, after: float) -> float | None:
+    """Due time of the first milestone of a boost that started at ``start`` later than ``after``."""
+    for days, _ in MILESTONES:
+        due = start + days * 86400
+        if due > after:
+            return due
+    return None
+
+def milestone_label(start: float, due: float) -> str:
+    days = round((due - start) / 86400)
+    return next(label for d, label in MILESTONES if d == days)
+
+class MilestoneScheduler:
+    """Announces boost milestones when they come due, without scanning anyone's boost.
+
+    Each booster has at most one live heap entry ``(due, guild_id, user_id, start)``: their
+    next milestone. Cancelling only forgets the boost in ``_live``; its heap entry is skipped
+    when it reaches the top, and the heap is rebuilt once more than half of it is stale. The
+    worker sleeps until the earliest entry is due, or until ``schedule`` adds an earlier one.
+    """
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self._heap: list[tuple[float, int, int, float]] = []
+        self._live: dict[int, dict[int, float]] = {}  # guild_id -> user_id -> boost start
+        self._stale = 0
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.announced = 0
+        # Milestones due before this were announced by the previous run (set from the snapshot).
+        self.resume_after = 0.0
+
+    def __len__(self) -> int:
+        return len(self._heap) - self._stale
+
+    def schedule(self, guild_id: int, user_id: int, start: float, now: float | None = None):
+        guild = self._live.setdefault(guild_id, {})
+        previous = guild.get(user_id)
+        if previous == start:
+            return
+        if previous is not None:
+            self._stale += 1
+        due = next_milestone(start, time.time() if now is None else now)
+        if due is None:
+            guild.pop(user_id, None)
+            return
+        guild[user_id] = start
+        heapq.heappush(self._heap, (due, guild_id, user_id, start))
+        if self._heap[0][0] == due:
+            self._wakeup.set()
+
+    def cancel(self, guild_id: int, user_id: int):
+        guild = self._live.get(guild_id)
+        if guild is not None and guild.pop(user_id, None) is not None:
+            self._stale += 1
+            self._maybe_rebuild()
+
+    def load_guild(self, guild_id: int, starts: dict[int, float]):
+        """Replace everything scheduled for ``guild_id`` with the boosts in ``starts`` (user_id -> start).
+
+        Milestones that came due while the bot was down are scheduled too, so ``_run`` announces
+        those still within ``MILESTONE_GRACE``.
+        """
+        now = time.time()
+        after = min(now, max(now - MILESTONE_GRACE, self.resume_after))
+        live = self._live.get(guild_id, {})
+        for user_id in live.keys() - starts.keys():
+            del live[user_id]
+            self._stale += 1
+        for user_id, start in starts.items():
+            self.schedule(guild_id, user_id, start, after)
+        self._maybe_rebuild()
+
+    def forget(self, guild_id: int):
+        self._stale += len(self._live.pop(guild_id, {}))
+        self._maybe_rebuild()
+
+    def _is_live(self, entry: tuple[float, int, int, float]) -> bool:
+        _, guild_id, user_id, start = entry
+        return self._live.get(guild_id, {}).get(user_id) == start
+
+    def _maybe_rebuild(self):
+        if self._stale > 1024 and self._stale * 2 > len(self._heap):
+            self._heap = [entry for entry in self._heap if self._is_live(entry)]
+            heapq.heapify(self._heap)
+            self._stale = 0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = self.bot.loop.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _run(self):
+        while True:
+            heap = self._heap  # _maybe_rebuild swaps the list
+            while heap and not self._is_live(heap[0]):
+                heapq.heappop(heap)
+                self._stale -= 1
+            now = time.time()
+            if not heap or heap[0][0] > now:
+                self._wakeup.clear()
+                # Capped so a wall-clock jump is noticed within the hour.
+                timeout = min(heap[0][0] - now, 3600.0) if heap else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due, guild_id, user_id, start = heapq.heappop(heap)
+            following = next_milestone(start, due)
+            if following is None:
+                del self._live[guild_id][user_id]
+            else:
+                heapq.heappush(heap, (following, guild_id, user_id, start))
+            if now - due <= MILESTONE_GRACE:
+                try:
+                    await self._announce(guild_id, user_id, start, milestone_label(start, due))
+                except Exception:
+                    log.exception("Error announcing boost milestone", extra={"guild_id": guild_id, "user_id": user_id, "event": "milestone"})
+
+    async def _announce(self, guild_id: int, user_id: int, start: float, label: str):
+        guild = self.bot.get_guild(guild_id)
+        if guild is None:
+            return
+        # A missed leave or unboost must not be congratulated: the booster index is the truth.
+        index = self.bot._booster_index.get(guild_id)
+        since = index.since(user_id) if index is not None else None
+        if since is None or abs(since.timestamp() - start) > 1.0:
+            self.cancel(guild_id, user_id)
+            return
+        config = await config_store.get(guild_id)
+        member = guild.get_member(user_id)
+        bot = self.bot
+        embed = bot.embeds.make(
+            f"{bot.boost_emoji} Boost Milestone {bot.boost_emoji}",
+            f"<@{user_id}> has been boosting the server for **{label}**! Thank you for your support!",
+            thumbnail=member.display_avatar if member is not None else guild.icon,
+        )
+        if bot.announcer.submit(guild, config, Announcement(Announcement.MILESTONE, embed, mention=f"<@{user_id}>")):
+            self.announced += 1
+
+# --------------------------------------------------------------------------------------
+# Top.gg votes (webhook receiver, TTL vote index, rate-limited API fallback)
+# --------------------------------------------------------------------------------------
+TOPGG_API_TOKEN = os.getenv("TOPGG_API_TOKEN") or None
+TOPGG_BOT_ID = os.getenv("TOPGG_BOT_ID", "1411081092689166460")
+TOPGG_WEBHOOK_AUTH = os.getenv("TOPGG_WEBHOOK_AUTH") or None
+TOPGG_WEBHOOK_PORT = int(os.getenv("TOPGG_WEBHOOK_PORT", "0")) or None
+TOPGG_WEBHOOK_HOST = os.getenv("TOPGG_WEBHOOK_HOST", "0.0.0.0")
+TOPGG_API_RATE = float(os.getenv("TOPGG_API_RATE", "0.5"))  # fallback API checks per second
+VOTE_TTL = 12 * 3600.0  # a Top.gg vote counts for 12 hours
+VOTE_URL = f"https://top.gg/bot/{TOPGG_BOT_ID}/vote"
+
+metrics.counter("nitroping_topgg_votes_total", "Votes received by the Top.gg webhook, by type.")
+metrics.counter("nitroping_topgg_api_checks_total", "Top.gg API vote checks, by result.")
+
+class VoteIndex:
+    """Who voted in the last ``ttl`` seconds, answered from memory.
+
+    Votes arrive through the webhook and are written through to storage, so a restart or
+    another cluster still finds them. A lookup that misses memory reads storage (local, no
+    request). Only then, and only with an API token, is Top.gg asked: concurrent checks for
+    one user share a request, checks are paced to ``api_rate`` per second, and a "not voted"
+    answer is remembered for ``negative_ttl`` seconds. When the budget is spent the index
+    answers from what it knows instead of waiting.
+    """
+
+    def __init__(self, storage: StorageBackend, ttl: float = VOTE_TTL, api_token: str | None = None,
+                 bot_id: str = TOPGG_BOT_ID, api_rate: float = TOPGG_API_RATE, negative_ttl: float = 600.0):
+        self.storage = storage
+        self.ttl = ttl
+        self.api_token = api_token
+        self.bot_id = bot_id
+        self.api_rate = api_rate
+        self.negative_ttl = negative_ttl
+        self._expires: dict[int, float] = {}         # user_id -> vote expiry
+        self._heap: list[tuple[float, int]] = []      # (expiry, user_id), for pruning
+        self._checked: OrderedDict[int, float] = OrderedDict()  # user_id -> when a check said "not voted"
+        self._inflight: dict[int, asyncio.Future] = {}
+        self._next_api_call = 0.0
+        self._session: aiohttp.ClientSession | None = None
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+    def _prune(self, now: float):
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            expires, user_id = heapq.heappop(heap)
+            if self._expires.get(user_id) == expires:
+                del self._expires[user_id]
+        while self._checked and next(iter(self._checked.values())) <= now - self.negative_ttl:
+            self._checked.popitem(last=False)
+
+    def _remember(self, user_id: int, expires: float):
+        if expires > self._expires.get(user_id, 0.0):
+            self._expires[user_id] = expires
+            heapq.heappush(self._heap, (expires, user_id))
+        self._checked.pop(user_id, None)
+
+    async def record(self, user_id: int, at: float | None = None):
+        expires = (time.time() if at is None else at) + self.ttl
+        self._prune(time.time())
+        self._remember(user_id, expires)
+        await self.storage.save_vote(user_id, expires)
+
+    def cached(self, user_id: int) -> bool:
+        return self._expires.get(user_id, 0.0) > time.time()
+
+    async def has_voted(self, user_id: int, use_api: bool = True) -> bool:
+        now = time.time()
+        self._prune(now)
+        if self._expires.get(user_id, 0.0) > now:
+            return True
+        expires = await self.storage.load_vote(user_id)
+        if expires is not None and expires > now:
+            self._remember(user_id, expires)
+            return True
+        if not use_api or not self.api_token or user_id in self._checked:
+            return False
+        return await self._check_api(user_id)
+
+    async def _check_api(self, user_id: int) -> bool:
+        pending = self._inflight.get(user_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        now = time.monotonic()
+        if self.api_rate <= 0 or now < self._next_api_call:
+            metrics.inc("nitroping_topgg_api_checks_total", result="throttled")
+            return False
+        self._next_api_call = now + 1 / self.api_rate
+
+        future = self._inflight[user_id] = asyncio.get_running_loop().create_future()
+        voted = False
+        try:
+            voted = await self._api_vote(user_id)
+            return voted
+        finally:
+            del self._inflight[user_id]
+            future.set_result(voted)
+
+    async def _api_vote(self, user_id: int) -> bool:
+        try:
+            voted = await self._request(user_id)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+            log.warning("Top.gg vote check failed: %s", e, extra={"user_id": user_id, "event": "topgg"})
+            metrics.inc("nitroping_topgg_api_checks_total", result="error")
+            return False
+        metrics.inc("nitroping_topgg_api_checks_total", result="voted" if voted else "not_voted")
+        if voted:
+            # The API doesn't say when the vote was cast; count it from now.
+            await self.record(user_id)
+        else:
+            self._checked[user_id] = time.time()
+        return voted
+
+    async def _request(self, user_id: int) -> bool:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5))
+        async with self._session.get(f"https://top.gg/api/bots/{self.bot_id}/check", params={"userId": str(user_id)},
+                                     headers={"Authorization": self.api_token}) as resp:
+            resp.raise_for_status()
+            return bool((await resp.json())["voted"])
+
+    async def webhook(self, request: aiohttp.web.Request) -> aiohttp.web.Response:
+        """POST handler for Top.gg vote webhooks."""
+        if not TOPGG_WEBHOOK_AUTH or not hmac.compare_digest(
+            request.headers.get("Authorization", "").encode(), TOPGG_WEBHOOK_AUTH.encode()
+        ):
+            return aiohttp.web.Response(status=401)
+        try:
+            payload = await request.json()
+            user_id = int(payload["user"])
+            kind = str(payload.get("type", "upvote"))
+        except (ValueError, KeyError, TypeError):
+            return aiohttp.web.Response(status=400)
+        if str(payload.get("bot", self.bot_id)) != str(self.bot_id):
+            return aiohttp.web.Response(status=400)
+        metrics.inc("nitroping_topgg_votes_total", type=kind)
+        try:
+            await self.record(user_id)
+        except Exception:
+            # Top.gg retries on 5xx; the vote is already in memory.
+            log.exception("Could not store Top.gg vote", extra={"user_id": user_id, "event": "topgg"})
+            return aiohttp.web.Response(status=500)
+        return aiohttp.web.Response(status=204)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+votes = VoteIndex(storage, api_token=TOPGG_API_TOKEN)
+
+# --------------------------------------------------------------------------------------
+# Presence debouncing
+# --------------------------------------------------------------------------------------
+PRESENCE_INTERVAL = float(os.getenv("PRESENCE_INTERVAL", "60"))
+
+class Debouncer:
+    """Runs ``func`` at most once per ``interval`` seconds.
+
+    The first trigger after a quiet period runs immediately; triggers inside the window collapse
+    into a single trailing run at the end of it. ``suppressed`` counts the collapsed triggers.
+    """
+
+    def __init__(self, func, interval: float):
+        self.func = func
+        self.interval = interval
+        self.sent = 0
+        self.suppressed = 0
+        self._last = float("-inf")
+        self._handle: asyncio.TimerHandle | None = None
+        self._task: asyncio.Task | None = None
+
+    def trigger(self):
+        if self._handle is not None:
+            self.suppressed += 1
+            return
+        loop = asyncio.get_running_loop()
+        delay = self._last + self.interval - loop.time()
+        if delay <= 0:
+            self._fire()
+        else:
+            self._handle = loop.call_later(delay, self._fire)
+
+    def _fire(self):
+        self._handle = None
+        self._last = asyncio.get_running_loop().time()
+        self.sent += 1
+        self._task = asyncio.get_running_loop().create_task(self._call())
+
+    async def _call(self):
+        try:
+            await self.func()
+        except Exception:
+            log.exception("Debounced %s failed", getattr(self.func, "__name__", "call"))
+
+    def cancel(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
 
 # --------------------------------------------------------------------------------------
 # Bot class
 # --------------------------------------------------------------------------------------
-class NitroPing(commands.Bot):
+class NitroPingTree(app_commands.CommandTree):
+    """Command tree that times every slash command for the metrics endpoint."""
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras["started"] = time.perf_counter()
+        # Everything the command sends from here on (same task) jumps the REST queue.
+        _rest_priority.set(RestScheduler.INTERACTION)
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        observe_command(interaction, "error")
+        await super().on_error(interaction, error)
+
+def observe_command(interaction: discord.Interaction, status: str):
+    started = interaction.extras.get("started")
+    if started is not None and interaction.command is not None:
+        metrics.observe("nitroping_command_seconds", time.perf_counter() - started,
+                        command=interaction.command.qualified_name, status=status)
+
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None  # None = Discord's recommendation
+
+class NitroPing(commands.AutoShardedBot):
     def __init__(self):
-        super().__init__(command_prefix='/', intents=intents)
+        super().__init__(
+            command_prefix='/',
+            intents=intents,
+            shard_count=SHARD_COUNT,
+            tree_cls=NitroPingTree,
+            member_cache_flags=member_cache_flags(),
+            chunk_guilds_at_startup=not LOW_MEMORY,
+        )
         self.bot_name = "NitroPing"
         self.boost_emoji = "<a:nitro:1411082919019155456>"
         self.footer_emoji = "<:boostergem:1411082984450162718>"  # (not used in footer anymore)
+        self.embeds = EmbedFactory(self.bot_name)
         self._boost_counts: dict[int, int] = {}
+        self._booster_index: dict[int, BoosterIndex] = {}
+        self._role_index: dict[int, RoleIndex] = {}
+        self.channels = ChannelResolver(self)
+        self.announcer = AnnouncementQueue(self, window=ANNOUNCE_WINDOW)
+        self.correlator = BoostCorrelator(window=BOOST_CORRELATION_WINDOW)
+        self.reconciler = RoleReconciler(self, RECONCILE_INTERVAL, RECONCILE_CONCURRENCY, RECONCILE_RATE)
+        self.snapshot = BoosterSnapshot(self, SNAPSHOT_PATH, SNAPSHOT_INTERVAL)
+        self.milestones = MilestoneScheduler(self)
+        self.force_sync = False
+        self.sync_on_start = True
+        self.cluster: ClusterLink | None = None
+        self.presence = Debouncer(self.update_presence, PRESENCE_INTERVAL)
+        self.web = WebServer()
+        self.web.app.router.add_get("/metrics", metrics_endpoint)
+        self.webhooks = WebServer(client_max_size=16 * 1024)
+        self.webhooks.app.router.add_post("/topgg", votes.webhook)
+        instrument_http(self.http)
+        schedule_http(self.http)
+        self._register_gauges()
+        self._first_ready_logged = False
+        history.reconcile = self._reconcile_history
+        self._session_started: float | None = None  # first READY of this process
+        self._role_edits: set[asyncio.Task] = set()
+        parsers = self._connection.parsers
+        self._parse_member_update_cached = parsers["GUILD_MEMBER_UPDATE"]
+        self._parse_guild_create_cached = parsers["GUILD_CREATE"]
+        self._parse_ready_cached = parsers["READY"]
+        parsers["GUILD_MEMBER_UPDATE"] = self._parse_member_update
+        parsers["GUILD_CREATE"] = self._parse_guild_create
+        parsers["READY"] = self._parse_ready
+
+    def _parse_ready(self, data):
+        startup_profile.mark("gateway READY")
+        # Only the first: a re-identify must not hide boosts that started during the reconnect gap.
+        if self._session_started is None:
+            self._session_started = time.time()
+        return self._parse_ready_cached(data)
+
+    def _parse_guild_create(self, data):
+        # Seed boost counts straight from the payload as guilds stream in; no per-guild work in on_ready.
+        if not data.get("unavailable"):
+            self._boost_counts[int(data["id"])] = data.get("premium_subscription_count") or 0
+        return self._parse_guild_create_cached(data)
+
+    def _parse_member_update(self, data):
+        """GUILD_MEMBER_UPDATE for members discord.py has not cached would be dropped; recover boost changes from the index."""
+        state = self._connection
+        guild = state._get_guild(int(data["guild_id"]))
+        if guild is None or guild.get_member(int(data["user"]["id"])) is not None:
+            return self._parse_member_update_cached(data)
+
+        after = discord.Member(data=data, guild=guild, state=state)
+        if after.premium_since or state.member_cache_flags.joined:
+            guild._add_member(after)
+        index = self._booster_index.get(guild.id)
+        if index is None:
+            return
+        since = index.since(after.id)
+        if since is None and after.premium_since is not None and not self._is_new_boost(after.premium_since):
+            # Boosting since before we knew about them (e.g. before the bot joined): not a new boost.
+            index.add(after.id, after.premium_since, after.display_name)
+            self.loop.create_task(self._adopt_booster(after))
+            return
+        before = discord.Member._copy(after)
+        before.premium_since = since
+        self.dispatch("member_update", before, after)
+
+    def _is_new_boost(self, premium_since: datetime) -> bool:
+        """A boost we didn't know about is new if it started within ``NEW_BOOST_GRACE`` seconds, or at any
+        point since the process first connected (we were running, so its event was missed)."""
+        ts = premium_since.timestamp()
+        started = self._session_started
+        return ts >= time.time() - NEW_BOOST_GRACE or (started is not None and ts >= started)
+
+    async def _adopt_booster(self, member: discord.Member):
+        """Persist a booster found without a record, without announcing or touching roles."""
+        try:
+            start = member.premium_since
+            if start.tzinfo is not None:
+                start = start.astimezone(tz=None).replace(tzinfo=None)
+            await storage.save_user(member.guild.id, member.id,
+                                    {"boost_start": start.isoformat(), "name": member.display_name})
+            ts = member.premium_since.timestamp()
+            self.milestones.schedule(member.guild.id, member.id, ts)
+            await history.record_start(member.guild.id, member.id, ts)
+        except Exception:
+            log.exception("Could not store booster record", extra={"guild_id": member.guild.id, "user_id": member.id,
+                                                                    "event": "member_update"})
+
+    def command_tree_hash(self) -> str:
+        """Stable hash of the global command tree as it would be sent to Discord."""
+        payload = sorted((cmd.to_dict(self.tree) for cmd in self.tree.get_commands()), key=lambda c: (c["type"], c["name"]))
+        blob = json.dumps({"application_id": self.application_id, "commands": payload}, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _register_gauges(self):
+        metrics.gauge("nitroping_gateway_latency_seconds", "Heartbeat latency per shard.",
+                      lambda: [({"shard": sid}, lat) for sid, lat in self.latencies if lat == lat])
+        metrics.gauge("nitroping_guilds", "Guilds served by this process.", lambda: len(self.guilds))
+        metrics.gauge("nitroping_announce_queue_depth", "Announcements waiting in channel queues.", self.announcer.depth)
+        metrics.gauge("nitroping_announce_dropped_total", "Announcements dropped because a channel queue was full.",
+                      lambda: self.announcer.dropped, kind="counter")
+        metrics.gauge("nitroping_storage_pending_writes", "Writes waiting for the next storage batch.",
+                      lambda: len(getattr(storage, "_pending", ())))
+        metrics.gauge("nitroping_config_cache_entries", "Guild configs held in memory.", lambda: len(config_store))
+        metrics.gauge("nitroping_channel_lookups_total", "Channel resolver lookups by result.",
+                      lambda: [({"result": k}, v) for k, v in self.channels.stats().items() if k in ("hits", "misses", "negative_hits")],
+                      kind="counter")
+        metrics.gauge("nitroping_channel_cache_entries", "Channel resolver cache size.",
+                      lambda: [({"cache": k}, v) for k, v in self.channels.stats().items() if k in ("fetched", "missing")])
+        metrics.gauge("nitroping_boost_events_deduplicated_total", "Guild-level boosts matched to member events.",
+                      lambda: self.correlator.suppressed, kind="counter")
+        metrics.gauge("nitroping_presence_updates_total", "Presence updates by outcome.",
+                      lambda: [({"outcome": "sent"}, self.presence.sent), ({"outcome": "suppressed"}, self.presence.suppressed)],
+                      kind="counter")
+        metrics.gauge("nitroping_rest_waiting", "REST calls queued in the scheduler, by priority.",
+                      lambda: [({"priority": n}, scheduler.waiting[i]) for i, n in enumerate(RestScheduler.NAMES)])
+        metrics.gauge("nitroping_rest_shed_total", "Low-priority REST calls dropped under load, by priority.",
+                      lambda: [({"priority": n}, scheduler.shed[i]) for i, n in enumerate(RestScheduler.NAMES)],
+                      kind="counter")
+        metrics.gauge("nitroping_roles_reconciled_total", "Members fixed by role reconciliation.",
+                      lambda: self.reconciler.fixed, kind="counter")
+        metrics.gauge("nitroping_snapshot_catchup_events_total", "Boost changes found by diffing the booster snapshot at startup.",
+                      lambda: self.snapshot.caught_up, kind="counter")
+        metrics.gauge("nitroping_topgg_votes_cached", "Users with a live Top.gg vote in memory.", lambda: len(votes))
+        metrics.gauge("nitroping_milestones_scheduled", "Boosters with an upcoming milestone announcement.",
+                      lambda: len(self.milestones))
+        metrics.gauge("nitroping_milestones_announced_total", "Boost milestone announcements queued.",
+                      lambda: self.milestones.announced, kind="counter")
 
     async def setup_hook(self):
+        startup_profile.mark("login")
+        self.add_dynamic_items(BoosterPageButton)
+        await asyncio.to_thread(self.snapshot.load)
+        self.milestones.resume_after = self.snapshot.written_at or 0.0
+        # Client.run only handles Ctrl+C; systemd, docker stop and the cluster launcher send SIGTERM.
+        # Closing writes the snapshot and flushes storage and history.
+        try:
+            self.loop.add_signal_handler(signal.SIGTERM, lambda: self.loop.create_task(self.close()))
+        except NotImplementedError:  # Windows
+            pass
+        if self.cluster is not None:
+            self.cluster.attach(self)
+        if METRICS_PORT:
+            port = METRICS_PORT + (self.cluster.cluster_id if self.cluster is not None else 0)
+            try:
+                await self.web.start(METRICS_HOST, port)
+                log.info("Metrics on http://%s:%d/metrics", METRICS_HOST, port)
+            except OSError as e:
+                log.warning("Could not start metrics endpoint: %s", e)
+        if TOPGG_WEBHOOK_PORT and (self.cluster is None or self.cluster.cluster_id == 0):
+            if not TOPGG_WEBHOOK_AUTH:
+                log.warning("TOPGG_WEBHOOK_PORT is set but TOPGG_WEBHOOK_AUTH is empty; not accepting votes.")
+            else:
+                try:
+                    await self.webhooks.start(TOPGG_WEBHOOK_HOST, TOPGG_WEBHOOK_PORT)
+                    log.info("Top.gg webhook on http://%s:%d/topgg", TOPGG_WEBHOOK_HOST, TOPGG_WEBHOOK_PORT)
+                except OSError as e:
+                    log.warning("Could not start Top.gg webhook: %s", e)
+        if self.sync_on_start:
+            await self.sync_commands()
+        startup_profile.mark("command sync")
+
+    async def sync_commands(self):
+        # Only sync when the command tree changed since the last successful sync (or --force-sync).
+        digest = self.command_tree_hash()
+        try:
+            stored = await asyncio.to_thread(COMMAND_HASH_PATH.read_text, encoding="utf-8")
+        except OSError:
+            stored = None
+        if not self.force_sync and stored and stored.strip() == digest:
+            log.info("App commands unchanged, skipping tree.sync().")
+            return
         try:
             synced = await self.tree.sync()
-            print(f"[NitroPing] Synced {len(synced)} app commands.")
-        except Exception as e:
-            print(f"[NitroPing] WARNING: tree.sync() failed: {e}")
+            log.info("Synced %d app commands.", len(synced))
+            await asyncio.to_thread(COMMAND_HASH_PATH.write_text, digest, encoding="utf-8")
+        except Exception:
+            log.exception("tree.sync() failed")
+
+    async def close(self):
+        await self.web.close()
+        await self.webhooks.close()
+        await votes.close()
+        self.presence.cancel()
+        self.reconciler.stop()
+        self.snapshot.stop()
+        self.milestones.stop()
+        await self.announcer.close()
+        try:
+            await self.snapshot.write()
+        except Exception:
+            log.exception("Could not write booster snapshot", extra={"event": "snapshot"})
+        await super().close()
+        await history.close()
+        await storage.flush()
+        storage.close()
 
     async def on_ready(self):
-        print(f"[NitroPing] discord.py: {discord.__version__}")
-        for g in self.guilds:
-            ensure_guild_config(g.id)
-            try:
-                self._boost_counts[g.id] = getattr(g, "premium_subscription_count", 0) or 0
-            except Exception:
-                self._boost_counts[g.id] = 0
-        print(f"[NitroPing] Logged in as {self.user} (ID: {self.user.id})")
-        await self.update_presence()
+        # Fires again on every reconnect, so it must stay cheap: guild state is created lazily on first use.
+        log.info("Logged in as %s (ID: %s), discord.py %s", self.user, self.user.id, discord.__version__)
+        if not self._first_ready_logged:
+            self._first_ready_logged = True
+            startup_profile.mark("guild availability")
+            log.info("Startup profile (%d guilds): %s", len(self.guilds), startup_profile.report())
+        self.presence.trigger()
+        self.reconciler.start()
+        self.snapshot.start()
+        self.milestones.start()
+        history.start()
 
     async def update_presence(self):
-        activity = discord.Activity(type=discord.ActivityType.watching, name=f"{len(self.guilds)} servers")
+        guilds = len(self.guilds)
+        if self.cluster is not None:
+            guilds = self.cluster.report(guilds)
+        activity = discord.Activity(type=discord.ActivityType.watching, name=f"{guilds} servers")
         await self.change_presence(activity=activity)
 
-    async def on_guild_join(self, guild: discord.Guild):
-        ensure_guild_config(guild.id)
+    def booster_index(self, guild: discord.Guild) -> BoosterIndex:
+        index = self._booster_index.get(guild.id)
+        if index is None:
+            index = self._booster_index[guild.id] = BoosterIndex.from_members(guild.members)
+        return index
+
+    def role_index(self, guild: discord.Guild) -> RoleIndex:
+        index = self._role_index.get(guild.id)
+        if index is None or index.guild is not guild:  # a re-identify replaces the Guild object
+            index = self._role_index[guild.id] = RoleIndex(guild)
+        return index
+
+    async def _build_booster_index(self, guild: discord.Guild):
+        records = None
+        if LOW_MEMORY:
+            try:
+                records = await storage.load_boosters(guild.id)
+            except Exception:
+                log.exception("Could not load booster records", extra={"guild_id": guild.id, "event": "guild_available"})
+        index = BoosterIndex.from_members(guild.members)
+        if records:
+            index.merge_records(records)
+        self._booster_index[guild.id] = index
+        self.milestones.load_guild(guild.id, index.timestamps())
+
+    async def _catch_up(self, guild: discord.Guild):
         try:
-            self._boost_counts[guild.id] = getattr(guild, "premium_subscription_count", 0) or 0
+            events = await self.snapshot.catch_up(guild)
         except Exception:
-            self._boost_counts[guild.id] = 0
-        await self.update_presence()
+            log.exception("Booster catch-up failed", extra={"guild_id": guild.id, "event": "catch_up"})
+            return
+        if events:
+            log.info("%d boost change(s) while offline.", events, extra={"guild_id": guild.id, "event": "catch_up"})
+
+    def _reconcile_history(self, guild_id: int, loaded: GuildBoostHistory) -> list[tuple]:
+        """Records that make a freshly read history log agree with the booster index.
+
+        Boosts from before history existed, or from a stretch the bot missed, are opened at their
+        real start. Entries left open for members who no longer boost are closed now.
+        """
+        index = self._booster_index.get(guild_id)
+        if index is None:
+            return []  # guild not available: nothing to compare with
+        now = time.time()
+        since = index.timestamps()
+        records = []
+        for user_id, ts in since.items():
+            known = loaded.open.get(user_id)
+            if known is not None and abs(known - ts) <= 1:
+                continue
+            if known is not None:  # boosted again while we weren't looking
+                records.append((BoostHistory.STOP, user_id, ts, known))
+            records.append((BoostHistory.START, user_id, ts, 0.0))
+        for user_id, start in loaded.open.items():
+            if user_id not in since:
+                records.append((BoostHistory.STOP, user_id, now, start))
+        return records
+
+    async def on_app_command_completion(self, interaction: discord.Interaction, command):
+        observe_command(interaction, "ok")
+
+    @timed_handler
+    async def on_guild_available(self, guild: discord.Guild):
+        self._role_index.pop(guild.id, None)  # holds the Guild from before the re-identify
+        history.unload(guild.id)  # boosts may have changed while the guild was away
+        await self._build_booster_index(guild)
+        await self._catch_up(guild)
+
+    @timed_handler
+    async def on_guild_join(self, guild: discord.Guild):
+        await self._build_booster_index(guild)
+        await self._catch_up(guild)
+        self.presence.trigger()
 
+    @timed_handler
     async def on_guild_remove(self, guild: discord.Guild):
         self._boost_counts.pop(guild.id, None)
-        await self.update_presence()
-
+        self._booster_index.pop(guild.id, None)
+        self._role_index.pop(guild.id, None)
+        self.correlator.forget(guild.id)
+        self.snapshot.forget(guild.id)
+        self.milestones.forget(guild.id)
+        config_store.discard(guild.id)
+        self.presence.trigger()
+
+    @timed_handler
+    async def on_guild_role_create(self, role: discord.Role):
+        index = self._role_index.get(role.guild.id)
+        if index is not None:
+            index.update(role)
+
+    @timed_handler
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        index = self._role_index.get(after.guild.id)
+        if index is None:
+            return
+        me = after.guild.me
+        if me is not None and after in me.roles and before.position != after.position:
+            index.rebuild()  # the bot's own role moved: what it can manage changed wholesale
+        else:
+            index.update(after)
+
+    @timed_handler
+    async def on_guild_role_delete(self, role: discord.Role):
+        index = self._role_index.get(role.guild.id)
+        if index is not None:
+            index.remove(role.id)
+
+    @timed_handler
     async def on_guild_update(self, before: discord.Guild, after: discord.Guild):
         """Backup announcer: if total boost count increases, send a message even if member event was missed."""
         try:
@@ -127,85 +3099,95 @@ class NitroPing(commands.Bot):
         except Exception:
             return
 
-        # If it increased, announce
-        if after_cnt > before_cnt:
-            config_path = ensure_guild_config(after.id)
-            try:
-                with config_path.open("r", encoding="utf-8") as f:
-                    cfg = json.load(f)
-            except Exception:
-                cfg = {"channel_id": None, "message": "Thank you for boosting the server!", "roles": []}
-
-            channel = resolve_announce_channel(self, after, cfg)
-            # If resolve_announce_channel returned a Task (fetch), await it
-            if isinstance(channel, asyncio.Task):
-                try:
-                    channel = await channel
-                except Exception:
-                    channel = None
-            if not channel:
-                self._boost_counts[after.id] = after_cnt
-                return
+        # Only increases no member event accounts for are announced, once the correlation window has passed.
+        if after_cnt > before_cnt and self.correlator.guild_gain(after.id, after_cnt - before_cnt):
+            self.loop.create_task(self._announce_missed_boosts(after))
 
-            gained = after_cnt - before_cnt
-            embed = discord.Embed(
-                title=f"{self.boost_emoji} New Server Boost{'s' if gained>1 else ''}! {self.boost_emoji}",
-                description=f"We just received **{gained}** new boost{'s' if gained>1 else ''}! {cfg.get('message','Thank you for boosting the server!')}",
-                color=discord.Color.purple(),
-                timestamp=UTCNOW()
-            )
-            embed.set_footer(text=f"{self.bot_name} • Silent Ember Hosting • {datetime.utcnow().strftime('%Y-%m-%d')}")
-            try:
-                if after.icon:
-                    embed.set_thumbnail(url=after.icon.url)
-            except Exception:
-                pass
+        self._boost_counts[after.id] = after_cnt
 
-            try:
-                await channel.send(embed=embed)
-            except Exception:
-                pass
+    async def _announce_missed_boosts(self, guild: discord.Guild):
+        await asyncio.sleep(self.correlator.window)
+        gained = self.correlator.take_missed(guild.id)
+        if gained <= 0:
+            return
 
-        self._boost_counts[after.id] = after_cnt
+        cfg = await config_store.get(guild.id)
+        template = guild_template(cfg)
+        message = template.render_for(guild, "our new booster" if gained == 1 else "our new boosters")
+        embed = self.embeds.make(
+            f"{self.boost_emoji} New Server Boost{'s' if gained>1 else ''}! {self.boost_emoji}",
+            f"We just received **{gained}** new boost{'s' if gained>1 else ''}! {message}",
+            thumbnail=guild.icon,
+        )
+        self.announcer.submit(guild, cfg, Announcement(Announcement.GUILD_BOOST, embed, count=gained, template=template))
+
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        self.channels.invalidate(channel.id)
+
+    async def on_guild_channel_update(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+        self.channels.invalidate(after.id)
+
+    async def on_interaction(self, interaction: discord.Interaction):
+        # Keep members that interact with the bot around in low-memory mode.
+        if LOW_MEMORY and interaction.guild is not None and isinstance(interaction.user, discord.Member):
+            if interaction.guild.get_member(interaction.user.id) is None:
+                interaction.guild._add_member(interaction.user)
+
+    @timed_handler
+    async def on_member_join(self, member: discord.Member):
+        if member.premium_since and member.guild.id in self._booster_index:
+            self._booster_index[member.guild.id].add(member.id, member.premium_since, member.display_name)
+
+    @timed_handler
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent):
+        """Fires for everyone who leaves, cached or not; LOW_MEMORY boosters usually aren't cached,
+        so ``on_member_remove`` would never see them."""
+        guild_id, user_id = payload.guild_id, payload.user.id
+        index = self._booster_index.get(guild_id)
+        start = None
+        if index is not None:
+            since = index.since(user_id)
+            start = since.timestamp() if since is not None else None
+            index.remove(user_id)
+        self.milestones.cancel(guild_id, user_id)
+        try:
+            user_data = await storage.load_user(guild_id, user_id)
+            if user_data and user_data.get("boost_start"):
+                if start is None:
+                    start = datetime.fromisoformat(user_data["boost_start"]).timestamp()
+                user_data["boost_start"] = None
+                await storage.save_user(guild_id, user_id, user_data)
+            if start is not None:
+                await history.record_stop(guild_id, user_id, time.time(), start)
+        except Exception:
+            log.exception("Error cleaning up after a booster left",
+                          extra={"guild_id": guild_id, "user_id": user_id, "event": "member_remove"})
 
+    @timed_handler
     async def on_member_update(self, before: discord.Member, after: discord.Member):
+        if after.id == self.user.id and before.roles != after.roles:
+            # The bot's top role decides which roles it can manage.
+            roles = self._role_index.get(after.guild.id)
+            if roles is not None:
+                roles.rebuild()
+        index = self._booster_index.get(after.guild.id)
         if before.premium_since == after.premium_since:
+            if index is not None and after.id in index and before.display_name != after.display_name:
+                index.names[after.id] = after.display_name
             return
+        if index is not None:
+            index.update_member(after)
 
         guild_id = after.guild.id
         user_id = after.id
-        config_file = ensure_guild_config(guild_id)
-        user_file = SERVERS_DIR / str(guild_id) / f"{user_id}.json"
-
         try:
-            with config_file.open("r", encoding="utf-8") as f:
-                config = json.load(f)
+            config = await config_store.get(guild_id)
+            template = guild_template(config)
+            embed = self.embeds.make(f"{self.boost_emoji} Server Boost Update {self.boost_emoji}", thumbnail=after.display_avatar)
 
-            channel = resolve_announce_channel(self, after.guild, config)
-            if isinstance(channel, asyncio.Task):
-                try:
-                    channel = await channel
-                except Exception:
-                    channel = None
-            if channel is None:
-                return
-
-            embed = discord.Embed(
-                title=f"{self.boost_emoji} Server Boost Update {self.boost_emoji}",
-                color=discord.Color.purple(),
-                timestamp=UTCNOW()
-            )
-            try:
-                embed.set_thumbnail(url=after.display_avatar.url)
-            except Exception:
-                pass
-
-            # Footer WITHOUT emojis (per request)
-            embed.set_footer(text=f"{self.bot_name} • Silent Ember Hosting • {datetime.utcnow().strftime('%Y-%m-%d')}")
-
-            user_data = {'boost_start': None}
-            if user_file.exists():
-                user_data = json.loads(user_file.read_text(encoding="utf-8"))
+            user_data = await storage.load_user(guild_id, user_id) or {'boost_start': None}
+            user_data['name'] = after.display_name
+            previous_start = user_data.get('boost_start')
 
             if after.premium_since and not before.premium_since:
                 # Started boosting
@@ -214,33 +3196,57 @@ class NitroPing(commands.Bot):
                     boost_start = boost_start.astimezone(tz=None).replace(tzinfo=None)
                 user_data['boost_start'] = (boost_start or datetime.utcnow()).isoformat()
 
-                embed.description = f"{after.mention} {config.get('message', 'Thank you for boosting the server!')}"
-                for role_id in config.get('roles', []):
-                    role = after.guild.get_role(int(role_id))
-                    if role:
-                        try:
-                            await after.add_roles(role, reason="Started boosting")
-                        except discord.Forbidden:
-                            pass
+                self.correlator.member_boost(guild_id)
+                kind = Announcement.BOOST
+                # Zero for a live boost; catch-up can announce one that started days ago.
+                days = max(0, int((UTCNOW() - after.premium_since).total_seconds() // 86400))
+                embed.description = template.thank(after.guild, after.mention, days=days)
             elif before.premium_since and not after.premium_since:
                 # Stopped boosting
                 user_data['boost_start'] = None
+                kind = Announcement.UNBOOST
                 embed.description = f"{after.mention} stopped boosting the server. Thank you for your support!"
-                for role_id in config.get('roles', []):
-                    role = after.guild.get_role(int(role_id))
-                    if role:
-                        try:
-                            await after.remove_roles(role, reason="Stopped boosting")
-                        except discord.Forbidden:
-                            pass
+                if LOW_MEMORY:
+                    after.guild._remove_member(after)
             else:
+                kind = Announcement.OTHER
                 embed.description = f"{after.mention} updated their boost status."
 
-            user_file.write_text(json.dumps(user_data, ensure_ascii=False), encoding="utf-8")
-            await channel.send(embed=embed)
+            # Persist before announcing: low-memory mode rebuilds the booster list from these records.
+            await storage.save_user(guild_id, user_id, user_data)
+            if kind == Announcement.BOOST:
+                start = datetime.fromisoformat(user_data['boost_start']).timestamp()
+                self.milestones.schedule(guild_id, user_id, start)
+                await history.record_start(guild_id, user_id, start)
+            elif kind == Announcement.UNBOOST:
+                self.milestones.cancel(guild_id, user_id)
+                start = datetime.fromisoformat(previous_start).timestamp() if previous_start else before.premium_since.timestamp()
+                await history.record_stop(guild_id, user_id, time.time(), start)
+
+            self.announcer.submit(after.guild, config, Announcement(
+                kind, embed, mention=after.mention, template=template
+            ))
+            # Last and detached: in a storm role edits queue for REST budget, and the record and
+            # the announcement must not wait behind them. Missed edits are fixed by reconciliation.
+            if kind != Announcement.OTHER:
+                boosting = kind == Announcement.BOOST
+                self._edit_roles(after, booster_roles(after.guild, config), boosting,
+                                 "Started boosting" if boosting else "Stopped boosting")
 
-        except Exception as e:
-            print(f"[NitroPing] Error in on_member_update: {e}")
+        except Exception:
+            log.exception("Error in on_member_update", extra={"guild_id": after.guild.id, "user_id": after.id, "event": "member_update"})
+
+    def _edit_roles(self, member: discord.Member, roles: list[discord.Role], boosting: bool, reason: str):
+        async def edit():
+            try:
+                await apply_booster_roles(member, roles, boosting, reason=reason)
+            except Exception:
+                log.exception("Could not update booster roles", extra={"guild_id": member.guild.id, "user_id": member.id,
+                                                                        "event": "member_update"})
+
+        task = self.loop.create_task(edit())
+        self._role_edits.add(task)
+        task.add_done_callback(self._role_edits.discard)
 
 bot = NitroPing()
 
@@ -248,56 +3254,76 @@ bot = NitroPing()
 # Interactive Role Config View for /set_roles
 # --------------------------------------------------------------------------------------
 class RolesConfigView(discord.ui.View):
-    def __init__(self, guild: discord.Guild, author_id: int, config_file: Path):
+    """Paginated booster-role picker. Picks survive paging; Save writes them all at once."""
+
+    PAGE_SIZE = 25  # Discord's cap on select options
+
+    def __init__(self, guild: discord.Guild, author_id: int, roles: list[discord.Role], selected: list[str]):
         super().__init__(timeout=300)
         self.guild = guild
         self.author_id = author_id
-        self.config_file = config_file
-        self.selected_ids: list[str] = []
-
-        # Build manageable role options (Discord max 25 options)
-        bot_member = guild.me
-        manageables = []
-        if bot_member and bot_member.top_role:
-            top = bot_member.top_role
-            for r in guild.roles:
-                if r.is_default():
-                    continue
-                if r.managed:  # bot/integration managed
-                    continue
-                if r >= top:   # can't manage roles >= bot's top role
-                    continue
-                manageables.append(r)
-
-        manageables = list(reversed(manageables))
-        manageables = manageables[:25]
-
-        options = [
-            discord.SelectOption(label=r.name[:100], value=str(r.id), description=f"ID {r.id}")
-            for r in manageables
-        ]
+        self.roles = roles  # the roles on offer: every manageable role, or the search results
+        self.selected_ids: list[str] = list(selected)
+        self.page = 0
+        self.pages = max(1, -(-len(roles) // self.PAGE_SIZE))
 
-        max_vals = min(25, max(1, len(options))) if options else 1
-
-        self.select = discord.ui.Select(
-            placeholder="Select booster roles (multi-select)",
-            min_values=0,
-            max_values=max_vals,
-            options=options,
-            row=0
-        )
+        self.select = discord.ui.Select(placeholder="Select booster roles (multi-select)", min_values=0, row=0)
         self.select.callback = self.select_callback
         self.add_item(self.select)
 
+        self.prev_button = self.PageButton(self, "◀ Prev", -1)
+        self.next_button = self.PageButton(self, "Next ▶", 1)
+        if self.pages > 1:
+            self.add_item(self.prev_button)
+            self.add_item(self.next_button)
         self.add_item(self.SaveButton(self))
         self.add_item(self.CancelButton(self))
+        self.show_page(0)
+
+    def show_page(self, page: int):
+        self.page = max(0, min(page, self.pages - 1))
+        chosen = set(self.selected_ids)
+        shown = self.roles[self.page * self.PAGE_SIZE:(self.page + 1) * self.PAGE_SIZE]
+        self.select.options = [
+            discord.SelectOption(label=r.name[:100], value=str(r.id), description=f"ID {r.id}", default=str(r.id) in chosen)
+            for r in shown
+        ] or [discord.SelectOption(label="No roles the bot can manage", value="none")]
+        self.select.max_values = max(1, len(shown))
+        self.select.disabled = not shown
+        self.prev_button.disabled = self.page == 0
+        self.next_button.disabled = self.page >= self.pages - 1
+
+    def embed(self) -> discord.Embed:
+        embed = bot.embeds.make(
+            "Configure Booster Roles",
+            "Select one or more roles from the dropdown, then press **Save**.\n"
+            "Only roles the bot can manage are shown.",
+        )
+        if self.pages > 1:
+            embed.description += f"\nPage {self.page + 1}/{self.pages} • {len(self.roles)} roles"
+        mentions = [r.mention for r in map(self.guild.get_role, map(int, self.selected_ids)) if r is not None]
+        embed.add_field(name="Selected", value=", ".join(mentions)[:1024] if mentions else "*None*", inline=False)
+        return embed
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
         return interaction.user.id == self.author_id
 
     async def select_callback(self, interaction: discord.Interaction):
-        self.selected_ids = list(self.select.values)
-        await interaction.response.defer()
+        # Replace only this page's picks; roles picked on other pages stay selected.
+        on_page = {o.value for o in self.select.options}
+        self.selected_ids = [rid for rid in self.selected_ids if rid not in on_page] + list(self.select.values)
+        self.show_page(self.page)
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+    class PageButton(discord.ui.Button):
+        def __init__(self, parent: "RolesConfigView", label: str, step: int):
+            super().__init__(label=label, style=discord.ButtonStyle.primary, row=1)
+            self.parent = parent
+            self.step = step
+
+        async def callback(self, interaction: discord.Interaction):
+            self.parent.show_page(self.parent.page + self.step)
+            await interaction.response.edit_message(embed=self.parent.embed(), view=self.parent)
 
     class SaveButton(discord.ui.Button):
         def __init__(self, parent: "RolesConfigView"):
@@ -306,16 +3332,9 @@ class RolesConfigView(discord.ui.View):
 
         async def callback(self, interaction: discord.Interaction):
             try:
-                with self.parent.config_file.open("r", encoding="utf-8") as f:
-                    config = json.load(f)
-                config["roles"] = self.parent.selected_ids
-                self.parent.config_file.write_text(json.dumps(config, ensure_ascii=False), encoding="utf-8")
-
-                embed = discord.Embed(
-                    title="Booster Roles Updated",
-                    color=discord.Color.purple(),
-                    timestamp=UTCNOW()
-                )
+                await config_store.update(self.parent.guild.id, roles=self.parent.selected_ids)
+
+                embed = bot.embeds.make("Booster Roles Updated")
                 role_mentions = []
                 for rid in self.parent.selected_ids:
                     r = self.parent.guild.get_role(int(rid))
@@ -323,7 +3342,6 @@ class RolesConfigView(discord.ui.View):
                         role_mentions.append(r.mention)
                 display = ", ".join(role_mentions) if role_mentions else "*None*"
                 embed.add_field(name="Roles", value=display, inline=False)
-                embed.set_footer(text=f"{bot.bot_name} • Silent Ember Hosting • {datetime.utcnow().strftime('%Y-%m-%d')}")
 
                 await interaction.response.edit_message(embed=embed, view=None)
             except Exception as e:
@@ -337,6 +3355,85 @@ class RolesConfigView(discord.ui.View):
         async def callback(self, interaction: discord.Interaction):
             await interaction.response.edit_message(content="Cancelled.", embed=None, view=None)
 
+# --------------------------------------------------------------------------------------
+# /boosters pagination (stateless: everything a click needs is in the custom_id)
+# --------------------------------------------------------------------------------------
+BOOSTERS_PAGE_SIZE = 10
+
+def boosters_page(guild: discord.Guild, index: BoosterIndex, page: int) -> tuple[discord.Embed, discord.ui.View | None]:
+    """Render one page of ``index`` plus its Prev/Jump/Next buttons (None when it fits on one page)."""
+    pages = index.page_count(BOOSTERS_PAGE_SIZE)
+    page = max(0, min(page, pages - 1))
+    embed = bot.embeds.make(f"{bot.boost_emoji} Server Boosters {bot.boost_emoji}", thumbnail=guild.icon)
+    now = time.time()
+    for _, since, name in index.page(page, BOOSTERS_PAGE_SIZE):
+        days = int((now - since) // 86400)
+        embed.add_field(name=name, value=f"Boosting for {days} days", inline=False)
+    if pages == 1:
+        return embed, None
+
+    embed.description = f"Page {page + 1}/{pages} • {len(index)} boosters"
+    view = discord.ui.View(timeout=None)
+    for action in ("prev", "jump", "next"):
+        view.add_item(BoosterPageButton(guild.id, page, index.version, action))
+    # Nothing to keep in memory: clicks are routed by custom_id to BoosterPageButton.
+    view.stop()
+    return embed, view
+
+class BoosterPageButton(discord.ui.DynamicItem[discord.ui.Button],
+                        template=r"np:boosters:(?P<guild>[0-9]+):(?P<page>[0-9]+):(?P<version>[0-9]+):(?P<action>prev|jump|next)"):
+    """Prev/Jump/Next on a /boosters message; keeps working across restarts."""
+
+    LABELS = {"prev": "◀ Prev", "jump": "Jump…", "next": "Next ▶"}
+
+    def __init__(self, guild_id: int, page: int, version: int, action: str):
+        super().__init__(discord.ui.Button(
+            label=self.LABELS[action],
+            style=discord.ButtonStyle.secondary if action == "jump" else discord.ButtonStyle.primary,
+            custom_id=f"np:boosters:{guild_id}:{page}:{version}:{action}",
+        ))
+        self.guild_id = guild_id
+        self.page = page
+        self.version = version
+        self.action = action
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match: re.Match[str]):
+        return cls(int(match["guild"]), int(match["page"]), int(match["version"]), match["action"])
+
+    async def callback(self, interaction: discord.Interaction):
+        guild = interaction.guild
+        if guild is None or guild.id != self.guild_id:
+            await interaction.response.defer()
+            return
+        index = bot.booster_index(guild)
+        pages = index.page_count(BOOSTERS_PAGE_SIZE)
+        if self.action == "jump":
+            await interaction.response.send_modal(BoosterJumpModal(pages))
+            return
+        # If boosters changed since this page was rendered, step from the nearest page that still exists.
+        page = min(self.page, pages - 1) if self.version != index.version else self.page
+        page = (page + (1 if self.action == "next" else -1)) % pages
+        embed, view = boosters_page(guild, index, page)
+        await interaction.response.edit_message(embed=embed, view=view)
+
+class BoosterJumpModal(discord.ui.Modal, title="Jump to page"):
+    page = discord.ui.TextInput(label="Page", max_length=6)
+
+    def __init__(self, pages: int):
+        super().__init__(timeout=120)
+        self.page.placeholder = f"1-{pages}"
+
+    async def on_submit(self, interaction: discord.Interaction):
+        try:
+            page = int(self.page.value) - 1
+        except ValueError:
+            await interaction.response.send_message("Enter a page number.", ephemeral=True)
+            return
+        index = bot.booster_index(interaction.guild)
+        embed, view = boosters_page(interaction.guild, index, page)
+        await interaction.response.edit_message(embed=embed, view=view)
+
 # --------------------------------------------------------------------------------------
 # Slash commands
 # --------------------------------------------------------------------------------------
@@ -349,30 +3446,25 @@ async def invite(interaction: discord.Interaction):
 @admin_only
 async def test_boost(interaction: discord.Interaction):
     guild_id = interaction.guild_id
-    config_file = ensure_guild_config(guild_id)
 
     try:
-        with config_file.open('r', encoding="utf-8") as f:
-            config = json.load(f)
+        config = await config_store.get(guild_id)
 
         channel_id = config.get('channel_id')
         if not channel_id:
             await interaction.response.send_message("No boost channel set! Use /set_channel first.", ephemeral=True)
             return
 
-        channel = bot.get_channel(int(channel_id)) or await bot.fetch_channel(int(channel_id))
+        channel = await bot.channels.get(int(channel_id))
+        if channel is None:
+            await interaction.response.send_message("The configured boost channel is missing or not accessible. Use /set_channel again.", ephemeral=True)
+            return
 
-        embed = discord.Embed(
-            title=f"{bot.boost_emoji} Test Server Boost {bot.boost_emoji}",
-            description=f"{interaction.user.mention} {config.get('message','Thank you for boosting the server!')}",
-            color=discord.Color.purple(),
-            timestamp=UTCNOW()
+        embed = bot.embeds.make(
+            f"{bot.boost_emoji} Test Server Boost {bot.boost_emoji}",
+            guild_template(config).thank(interaction.guild, interaction.user.mention),
+            thumbnail=interaction.user.display_avatar,
         )
-        try:
-            embed.set_thumbnail(url=interaction.user.display_avatar.url)
-        except Exception:
-            pass
-        embed.set_footer(text=f"{bot.bot_name} • Silent Ember Hosting • {datetime.utcnow().strftime('%Y-%m-%d')}")
 
         await channel.send(embed=embed)
         await interaction.response.send_message("Test boost message sent!", ephemeral=True)
@@ -384,30 +3476,25 @@ async def test_boost(interaction: discord.Interaction):
 @admin_only
 async def test_boostloss(interaction: discord.Interaction):
     guild_id = interaction.guild_id
-    config_file = ensure_guild_config(guild_id)
 
     try:
-        with config_file.open('r', encoding="utf-8") as f:
-            config = json.load(f)
+        config = await config_store.get(guild_id)
 
         channel_id = config.get('channel_id')
         if not channel_id:
             await interaction.response.send_message("No boost channel set! Use /set_channel first.", ephemeral=True)
             return
 
-        channel = bot.get_channel(int(channel_id)) or await bot.fetch_channel(int(channel_id))
+        channel = await bot.channels.get(int(channel_id))
+        if channel is None:
+            await interaction.response.send_message("The configured boost channel is missing or not accessible. Use /set_channel again.", ephemeral=True)
+            return
 
-        embed = discord.Embed(
-            title=f"{bot.boost_emoji} Test Boost Loss {bot.boost_emoji}",
-            description=f"{interaction.user.mention} stopped boosting the server. Thank you for your support!",
-            color=discord.Color.purple(),
-            timestamp=UTCNOW()
+        embed = bot.embeds.make(
+            f"{bot.boost_emoji} Test Boost Loss {bot.boost_emoji}",
+            f"{interaction.user.mention} stopped boosting the server. Thank you for your support!",
+            thumbnail=interaction.user.display_avatar,
         )
-        try:
-            embed.set_thumbnail(url=interaction.user.display_avatar.url)
-        except Exception:
-            pass
-        embed.set_footer(text=f"{bot.bot_name} • Silent Ember Hosting • {datetime.utcnow().strftime('%Y-%m-%d')}")
 
         await channel.send(embed=embed)
         await interaction.response.send_message("Test boost loss message sent!", ephemeral=True)
@@ -420,14 +3507,10 @@ async def test_boostloss(interaction: discord.Interaction):
 @app_commands.describe(channel="The channel to send boost notifications to")
 async def set_channel(interaction: discord.Interaction, channel: discord.TextChannel):
     guild_id = interaction.guild_id
-    config_file = ensure_guild_config(guild_id)
 
     try:
-        with config_file.open('r', encoding="utf-8") as f:
-            config = json.load(f)
-
-        config['channel_id'] = str(channel.id)
-        config_file.write_text(json.dumps(config, ensure_ascii=False), encoding="utf-8")
+        await config_store.update(guild_id, channel_id=str(channel.id))
+        bot.channels.invalidate(channel.id)
 
         await interaction.response.send_message(f"Boost notifications channel set to {channel.mention}", ephemeral=True)
 
@@ -438,14 +3521,9 @@ async def set_channel(interaction: discord.Interaction, channel: discord.TextCha
 @admin_only
 async def channel_unset(interaction: discord.Interaction):
     guild_id = interaction.guild_id
-    config_file = ensure_guild_config(guild_id)
 
     try:
-        with config_file.open('r', encoding="utf-8") as f:
-            config = json.load(f)
-
-        config['channel_id'] = None
-        config_file.write_text(json.dumps(config, ensure_ascii=False), encoding="utf-8")
+        await config_store.update(guild_id, channel_id=None)
 
         await interaction.response.send_message("Boost notifications channel unset", ephemeral=True)
 
@@ -454,19 +3532,95 @@ async def channel_unset(interaction: discord.Interaction):
 
 @bot.tree.command(name="set_message", description="Set the boost thank you message (Admin only)")
 @admin_only
-@app_commands.describe(message="The new thank you message")
+@app_commands.describe(message="The new thank you message; placeholders: {user}, {count}, {tier}, {days}")
 async def set_message(interaction: discord.Interaction, message: str):
     guild_id = interaction.guild_id
-    config_file = ensure_guild_config(guild_id)
 
     try:
-        with config_file.open('r', encoding="utf-8") as f:
-            config = json.load(f)
+        template = compile_template(message)
+    except TemplateError as e:
+        await interaction.response.send_message(f"That message can't be used: {e}", ephemeral=True)
+        return
+
+    try:
+        await config_store.update(guild_id, message=message)
 
-        config['message'] = message
-        config_file.write_text(json.dumps(config, ensure_ascii=False), encoding="utf-8")
+        preview = template.thank(interaction.guild, interaction.user.mention)
+        await interaction.response.send_message(f"Boost thank you message updated! Preview:\n{preview}", ephemeral=True)
 
-        await interaction.response.send_message("Boost thank you message updated!", ephemeral=True)
+    except Exception as e:
+        await interaction.response.send_message(f"Error: {e}", ephemeral=True)
+
+@bot.tree.command(name="config_export", description="Export this server's NitroPing config as a file (Admin only)")
+@admin_only
+async def config_export(interaction: discord.Interaction):
+    try:
+        config = await config_store.get(interaction.guild_id)
+        payload = {"format": EXPORT_FORMAT, "version": EXPORT_VERSION, "guild_id": interaction.guild_id, "config": config}
+        blob = json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8")
+        file = discord.File(io.BytesIO(blob), filename=f"nitroping-{interaction.guild_id}.json")
+        await interaction.response.send_message("Here is this server's config.", file=file, ephemeral=True)
+    except Exception as e:
+        await interaction.response.send_message(f"Error: {e}", ephemeral=True)
+
+CONFIG_IMPORT_MAX_BYTES = 64 * 1024
+
+def import_guild_config(data, guild: discord.Guild) -> tuple[dict, list[str]]:
+    """Check an uploaded config against ``guild``. Returns the changes to apply and notes on
+    what was left out; raises ValueError when the file can't be used at all."""
+    if isinstance(data, dict) and data.get("format") == EXPORT_FORMAT:
+        data = data.get("config")
+    if not isinstance(data, dict):
+        raise ValueError("expected a JSON object")
+    changes: dict = {}
+    notes: list[str] = []
+
+    unknown = sorted(data.keys() - default_guild_config().keys())
+    if unknown:
+        notes.append(f"Ignored unknown keys: {', '.join(unknown)}")
+    if "message" in data:
+        if not isinstance(data["message"], str):
+            raise ValueError("message must be text")
+        compile_template(data["message"])
+        changes["message"] = data["message"]
+    if "channel_id" in data:
+        channel_id = data["channel_id"]
+        if channel_id in (None, ""):
+            changes["channel_id"] = None
+        elif not str(channel_id).isdigit():
+            raise ValueError("channel_id must be a channel id")
+        elif guild.get_channel(int(channel_id)) is None:
+            notes.append(f"Channel {channel_id} is not in this server; the channel was left unchanged")
+        else:
+            changes["channel_id"] = str(channel_id)
+    if "roles" in data:
+        if not isinstance(data["roles"], list) or not all(str(r).isdigit() for r in data["roles"]):
+            raise ValueError("roles must be a list of role ids")
+        roles = [str(r) for r in data["roles"] if guild.get_role(int(r)) is not None]
+        if len(roles) < len(data["roles"]):
+            notes.append(f"Dropped {len(data['roles']) - len(roles)} role(s) that are not in this server")
+        changes["roles"] = roles
+    return changes, notes
+
+@bot.tree.command(name="config_import", description="Import a NitroPing config file into this server (Admin only)")
+@admin_only
+@app_commands.describe(file="A file written by /config_export")
+async def config_import(interaction: discord.Interaction, file: discord.Attachment):
+    if file.size > CONFIG_IMPORT_MAX_BYTES:
+        await interaction.response.send_message("That file is too large to be a NitroPing config.", ephemeral=True)
+        return
+    try:
+        changes, notes = import_guild_config(json.loads(await file.read()), interaction.guild)
+    except (ValueError, discord.HTTPException) as e:
+        await interaction.response.send_message(f"That config can't be imported: {e}", ephemeral=True)
+        return
+
+    try:
+        await config_store.update(interaction.guild_id, **changes)
+        if changes.get("channel_id"):
+            bot.channels.invalidate(int(changes["channel_id"]))
+        summary = "Config imported." + "".join(f"\n• {note}" for note in notes)
+        await interaction.response.send_message(summary, ephemeral=True)
 
     except Exception as e:
         await interaction.response.send_message(f"Error: {e}", ephemeral=True)
@@ -474,31 +3628,39 @@ async def set_message(interaction: discord.Interaction, message: str):
 # ===== NEW: Interactive /set_roles with role embed & dropdown =====
 @bot.tree.command(name="set_roles", description="Set roles to give/remove for boosters (Admin only)")
 @admin_only
-async def set_roles(interaction: discord.Interaction):
-    guild_id = interaction.guild_id
-    config_file = ensure_guild_config(guild_id)
+@app_commands.describe(search="Only offer roles whose name matches this (pick one to preselect it)")
+async def set_roles(interaction: discord.Interaction, search: str | None = None):
+    index = bot.role_index(interaction.guild)
+    config = await config_store.get(interaction.guild_id)
+    selected = [str(r) for r in config.get("roles", [])]
+    if not search:
+        roles = index.ordered()
+    elif search.isdigit() and int(search) in index and (picked := interaction.guild.get_role(int(search))) is not None:
+        # Picked from the autocomplete list.
+        roles = [picked]
+        if search not in selected:
+            selected.append(search)
+    else:
+        roles = index.search(search, limit=None)
+        if not roles:
+            await interaction.response.send_message(f"No role the bot can manage matches `{search}`.", ephemeral=True)
+            return
 
-    embed = discord.Embed(
-        title="Configure Booster Roles",
-        description="Select one or more roles from the dropdown, then press **Save**.\n"
-                    "Only roles the bot can manage are shown (max 25).",
-        color=discord.Color.purple(),
-        timestamp=UTCNOW()
-    )
-    embed.set_footer(text=f"{bot.bot_name} • Silent Ember Hosting • {datetime.utcnow().strftime('%Y-%m-%d')}")
+    view = RolesConfigView(interaction.guild, interaction.user.id, roles, selected)
+    await interaction.response.send_message(embed=view.embed(), view=view, ephemeral=True)
 
-    view = RolesConfigView(interaction.guild, interaction.user.id, config_file)
-    await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+@set_roles.autocomplete("search")
+async def set_roles_search(interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+    roles = bot.role_index(interaction.guild).search(current)
+    return [app_commands.Choice(name=r.name[:100], value=str(r.id)) for r in roles]
 
 @bot.tree.command(name="roles_list", description="List configured boost roles (Admin only)")
 @admin_only
 async def roles_list(interaction: discord.Interaction):
     guild_id = interaction.guild_id
-    config_file = ensure_guild_config(guild_id)
 
     try:
-        with config_file.open('r', encoding="utf-8") as f:
-            config = json.load(f)
+        config = await config_store.get(guild_id)
 
         roles = config.get('roles', [])
         if not roles:
@@ -506,13 +3668,7 @@ async def roles_list(interaction: discord.Interaction):
             return
 
         role_mentions = [interaction.guild.get_role(int(r)).mention for r in roles if interaction.guild.get_role(int(r))]
-        embed = discord.Embed(
-            title="Configured Booster Roles",
-            description=", ".join(role_mentions) if role_mentions else "*None*",
-            color=discord.Color.purple(),
-            timestamp=UTCNOW()
-        )
-        embed.set_footer(text=f"{bot.bot_name} • Silent Ember Hosting • {datetime.utcnow().strftime('%Y-%m-%d')}")
+        embed = bot.embeds.make("Configured Booster Roles", ", ".join(role_mentions) if role_mentions else "*None*")
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
     except Exception as e:
@@ -521,48 +3677,87 @@ async def roles_list(interaction: discord.Interaction):
 @bot.tree.command(name="boosters", description="List current server boosters")
 async def boosters(interaction: discord.Interaction):
     guild = interaction.guild
-    boosters = [m for m in guild.members if m.premium_since]
-    page_size = 10
-    pages = [boosters[i:i + page_size] for i in range(0, len(boosters), page_size)]
-    current_page = 0
+    index = bot.booster_index(guild)
 
-    if not boosters:
+    if not index:
         await interaction.response.send_message("No boosters found!", ephemeral=True)
         return
 
-    def get_embed(page_idx: int):
-        embed = discord.Embed(
-            title=f"{bot.boost_emoji} Server Boosters {bot.boost_emoji}",
-            color=discord.Color.purple(),
-            timestamp=UTCNOW()
-        )
-        embed.set_footer(text=f"{bot.bot_name} • Silent Ember Hosting • {datetime.utcnow().strftime('%Y-%m-%d')}")
-        for booster in pages[page_idx]:
-            since = booster.premium_since
-            if since and since.tzinfo is not None:
-                since = since.astimezone(tz=None).replace(tzinfo=None)
-            days = (datetime.utcnow() - (since or datetime.utcnow())).days
-            embed.add_field(name=booster.display_name, value=f"Boosting for {days} days", inline=False)
-        if guild.icon:
-            try:
-                embed.set_thumbnail(url=guild.icon.url)
-            except Exception:
-                pass
-        return embed
+    embed, view = boosters_page(guild, index, 0)
+    await interaction.response.send_message(embed=embed, view=view or discord.utils.MISSING)
 
-    view = discord.ui.View(timeout=None)
+async def guild_history(interaction: discord.Interaction) -> GuildBoostHistory:
+    """The guild's boost history; defers first when its log has to be read (seconds for a big one)."""
+    if not history.is_loaded(interaction.guild.id):
+        await interaction.response.defer()
+    return await history.get(interaction.guild.id)
+
+async def reply(interaction: discord.Interaction, content: str | None = None, **kwargs):
+    if interaction.response.is_done():
+        await interaction.followup.send(content, **kwargs)
+    else:
+        await interaction.response.send_message(content, **kwargs)
+
+@bot.tree.command(name="boost_stats", description="Show a member's boost history")
+@app_commands.describe(member="Member to look up (defaults to you)")
+async def boost_stats(interaction: discord.Interaction, member: discord.Member | None = None):
+    member = member or interaction.user
+    stats = await guild_history(interaction)
+    now = time.time()
+    seconds = stats.total_seconds(member.id, now)
+    if not seconds and member.id not in stats.boosts:
+        await reply(interaction, f"{member.mention} has no recorded boosts yet.", ephemeral=True)
+        return
 
-    async def next_callback(inter: discord.Interaction):
-        nonlocal current_page
-        current_page = (current_page + 1) % len(pages)
-        await inter.response.edit_message(embed=get_embed(current_page), view=view)
+    embed = bot.embeds.make(f"{bot.boost_emoji} Boost Stats {bot.boost_emoji}", thumbnail=member.display_avatar)
+    embed.description = member.mention
+    embed.add_field(name="Total boost time", value=f"{seconds / 86400:.1f} days", inline=True)
+    embed.add_field(name="Boosts", value=str(stats.boosts.get(member.id, 0)), inline=True)
+    rank = stats.rank(member.id, now)
+    embed.add_field(name="Rank", value=f"#{rank}" if rank else "—", inline=True)
+    start = stats.open.get(member.id)
+    embed.add_field(name="Current boost", value=f"since <t:{int(start)}:D>" if start is not None else "not boosting", inline=False)
+    this_month = _month(now)
+    recent = [f"{(m % 12) + 1:02d}/{m // 12}: {stats.months.get(m, 0)}" for m in range(this_month - 5, this_month + 1)]
+    embed.add_field(name="Server boosts (last 6 months)", value="\n".join(recent), inline=False)
+    await reply(interaction, embed=embed)
+
+@bot.tree.command(name="leaderboard", description="Top boosters by total boost time")
+async def leaderboard(interaction: discord.Interaction):
+    stats = await guild_history(interaction)
+    top = stats.leaderboard(10, time.time())
+    if not top:
+        await reply(interaction, "No boost history yet!", ephemeral=True)
+        return
 
-    if len(pages) > 1:
-        next_button = discord.ui.Button(label="Next", style=discord.ButtonStyle.primary)
-        next_button.callback = next_callback
-        view.add_item(next_button)
+    embed = bot.embeds.make(f"{bot.boost_emoji} Booster Leaderboard {bot.boost_emoji}", thumbnail=interaction.guild.icon)
+    embed.description = "\n".join(
+        f"**{place}.** <@{user_id}> — {seconds / 86400:.1f} days" for place, (user_id, seconds) in enumerate(top, 1)
+    )
+    await reply(interaction, embed=embed)
+
+@bot.tree.command(name="vote", description="Vote for NitroPing on Top.gg")
+async def vote(interaction: discord.Interaction):
+    if votes.cached(interaction.user.id):
+        note = "Thanks, your vote is counted! You can vote again 12 hours after your last vote."
+    else:
+        note = "Votes help other servers find NitroPing. You can vote every 12 hours."
+    embed = bot.embeds.make(f"{bot.boost_emoji} Vote for {bot.bot_name} {bot.boost_emoji}", f"[Vote on Top.gg]({VOTE_URL})\n{note}")
+    await interaction.response.send_message(embed=embed, ephemeral=True)
 
-    await interaction.response.send_message(embed=get_embed(current_page), view=view)
+@bot.tree.command(name="has_voted", description="Check if a user voted on Top.gg in the last 12 hours (Admin only)")
+@admin_only
+@app_commands.describe(user="The user to check")
+async def has_voted(interaction: discord.Interaction, user: discord.User):
+    # Only a lookup that falls through to the Top.gg API is slow enough to need a deferral.
+    if not votes.cached(user.id) and votes.api_token:
+        await interaction.response.defer(ephemeral=True)
+    voted = await votes.has_voted(user.id)
+    text = f"{user.mention} has voted in the last 12 hours." if voted else f"{user.mention} hasn't voted in the last 12 hours."
+    if interaction.response.is_done():
+        await interaction.followup.send(text, ephemeral=True)
+    else:
+        await interaction.response.send_message(text, ephemeral=True)
 
 @bot.tree.command(name="support", description="Get support server invite")
 async def support(interaction: discord.Interaction):
@@ -593,16 +3788,14 @@ async def credits(interaction: discord.Interaction):
 
 @bot.tree.command(name="help", description="View available commands")
 async def help_cmd(interaction: discord.Interaction):
-    embed = discord.Embed(
-        title=f"{bot.boost_emoji} {bot.bot_name} Help {bot.boost_emoji}",
-        color=discord.Color.purple(),
-        timestamp=UTCNOW()
-    )
-    embed.set_footer(text=f"{bot.bot_name} • Silent Ember Hosting • {datetime.utcnow().strftime('%Y-%m-%d')}")
+    embed = bot.embeds.make(f"{bot.boost_emoji} {bot.bot_name} Help {bot.boost_emoji}")
 
     commands_list = [
         ("/invite", "Get the bot invite link"),
         ("/boosters", "List current server boosters and their boost duration"),
+        ("/boost_stats", "Show a member's total boost time and rank"),
+        ("/leaderboard", "Top boosters by total boost time"),
+        ("/vote", "Vote for the bot on Top.gg"),
         ("/support", "Get invite to the support server"),
         ("/credits", "View bot credits"),
         ("/help", "Show this help message")
@@ -616,7 +3809,10 @@ async def help_cmd(interaction: discord.Interaction):
             ("/channel_unset", "Unset boost notifications channel"),
             ("/set_message", "Set boost thank you message"),
             ("/set_roles", "Interactive role picker for boosters"),
-            ("/roles_list", "List configured boost roles")
+            ("/roles_list", "List configured boost roles"),
+            ("/config_export", "Export this server's config as a file"),
+            ("/config_import", "Import a config file from /config_export"),
+            ("/has_voted", "Check if a user voted on Top.gg")
         ])
 
     for cmd, desc in commands_list:
@@ -624,15 +3820,240 @@ async def help_cmd(interaction: discord.Interaction):
 
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
+# --------------------------------------------------------------------------------------
+# Cluster launcher (N worker processes, each owning a contiguous range of shards)
+# --------------------------------------------------------------------------------------
+class ClusterLink:
+    """Worker end of the launcher pipe: reports this cluster's guild count, receives the total."""
+
+    def __init__(self, conn: multiprocessing.connection.Connection, cluster_id: int):
+        self.conn = conn
+        self.cluster_id = cluster_id
+        self.total_guilds: int | None = None
+        self._reported = 0
+        self._bot: "NitroPing | None" = None
+
+    def attach(self, bot: "NitroPing"):
+        self._bot = bot
+        bot.loop.add_reader(self.conn.fileno(), self._on_readable)
+
+    def _on_readable(self):
+        try:
+            while self.conn.poll():
+                msg = self.conn.recv()
+                if msg.get("type") == "total" and msg["guilds"] != self.total_guilds:
+                    self.total_guilds = msg["guilds"]
+                    if self._bot is not None and self._bot.is_ready():
+                        self._bot.presence.trigger()
+        except (EOFError, OSError):
+            # Launcher is gone; keep running on local counts.
+            self._bot.loop.remove_reader(self.conn.fileno())
+
+    def report(self, guilds: int) -> int:
+        """Send the local guild count; returns the best current estimate of the cluster-wide total."""
+        if guilds != self._reported:
+            try:
+                self.conn.send({"type": "guilds", "cluster": self.cluster_id, "guilds": guilds})
+            except OSError:
+                pass
+        previous, self._reported = self._reported, guilds
+        if self.total_guilds is None:
+            return guilds
+        return self.total_guilds - previous + guilds
+
+def shard_ranges(shard_count: int, clusters: int) -> list[list[int]]:
+    """Split shard ids 0..shard_count-1 into ``clusters`` contiguous, near-equal ranges."""
+    size, extra = divmod(shard_count, clusters)
+    ranges, start = [], 0
+    for i in range(clusters):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+async def recommended_shard_count(token: str) -> int:
+    async with aiohttp.ClientSession() as session:
+        async with session.get("https://discord.com/api/v10/gateway/bot",
+                               headers={"Authorization": f"Bot {token}"}) as resp:
+            resp.raise_for_status()
+            return int((await resp.json())["shards"])
+
+def run_cluster_worker(cluster_id: int, shard_ids: list[int], shard_count: int,
+                       conn: multiprocessing.connection.Connection, force_sync: bool):
+    """Entry point of a cluster process (spawned, so this module is imported fresh)."""
+    setup_logging()
+    bot.shard_ids = shard_ids
+    bot.shard_count = shard_count
+    bot.cluster = ClusterLink(conn, cluster_id)
+    # Each cluster snapshots only its own guilds, so each needs its own file.
+    bot.snapshot.path = SNAPSHOT_PATH.with_name(f"{SNAPSHOT_PATH.stem}.{cluster_id}{SNAPSHOT_PATH.suffix}")
+    bot.sync_on_start = cluster_id == 0  # commands are global; one cluster is enough
+    bot.force_sync = force_sync
+    log.info("Cluster %d starting with shards %d-%d of %d.", cluster_id, shard_ids[0], shard_ids[-1], shard_count)
+    bot.run(TOKEN, log_handler=None)
+
+class _ClusterProcess:
+    __slots__ = ("cluster_id", "process", "conn", "started", "restarts", "restart_at")
+
+    def __init__(self, cluster_id: int):
+        self.cluster_id = cluster_id
+        self.process: multiprocessing.Process | None = None
+        self.conn: multiprocessing.connection.Connection | None = None
+        self.started = 0.0
+        self.restarts = 0
+        self.restart_at: float | None = 0.0
+
+def run_cluster_launcher(clusters: int, shard_count: int | None, force_sync: bool = False):
+    """Spawn ``clusters`` workers, relay guild counts between them and restart any that exit."""
+    if shard_count is None:
+        try:
+            shard_count = asyncio.run(recommended_shard_count(TOKEN))
+        except Exception as e:
+            log.warning("Could not fetch recommended shard count (%s); using %d.", e, clusters)
+            shard_count = clusters
+    shard_count = max(shard_count, clusters)
+    ranges = shard_ranges(shard_count, clusters)
+    log.info("Launching %d clusters for %d shards.", clusters, shard_count)
+
+    ctx = multiprocessing.get_context("spawn")
+    workers = [_ClusterProcess(i) for i in range(clusters)]
+    counts: dict[int, int] = {}
+    last_total = None
+
+    def start(w: _ClusterProcess):
+        parent_conn, child_conn = ctx.Pipe()
+        w.process = ctx.Process(
+            target=run_cluster_worker,
+            args=(w.cluster_id, ranges[w.cluster_id], shard_count, child_conn, force_sync and w.cluster_id == 0),
+            name=f"nitroping-cluster-{w.cluster_id}",
+        )
+        w.process.start()
+        child_conn.close()
+        w.conn = parent_conn
+        w.started = time.monotonic()
+        w.restart_at = None
+
+    def shutdown(*_):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    try:
+        while True:
+            now = time.monotonic()
+            for w in workers:
+                if w.restart_at is not None and now >= w.restart_at:
+                    start(w)
+                elif w.process is not None and w.restart_at is None and not w.process.is_alive():
+                    # Crash-looping workers back off exponentially; a worker that ran for a while starts fresh.
+                    w.restarts = 0 if now - w.started > 300 else w.restarts + 1
+                    delay = min(60, 2 ** w.restarts)
+                    log.warning("Cluster %d exited with code %s; restarting in %ds.", w.cluster_id, w.process.exitcode, delay)
+                    w.conn.close()
+                    w.conn = None
+                    counts.pop(w.cluster_id, None)
+                    w.restart_at = now + delay
+
+            conns = [w.conn for w in workers if w.conn is not None]
+            for conn in multiprocessing.connection.wait(conns, timeout=1.0):
+                try:
+                    msg = conn.recv()
+                except (EOFError, OSError):
+                    continue
+                if msg.get("type") == "guilds":
+                    counts[msg["cluster"]] = msg["guilds"]
+
+            total = sum(counts.values())
+            if total != last_total:
+                last_total = total
+                for w in workers:
+                    if w.conn is not None:
+                        try:
+                            w.conn.send({"type": "total", "guilds": total})
+                        except OSError:
+                            pass
+    except (KeyboardInterrupt, SystemExit):
+        log.info("Stopping clusters...")
+    finally:
+        # SIGTERM lets each worker close: write its snapshot and flush storage and history.
+        for w in workers:
+            if w.process is not None and w.process.is_alive():
+                w.process.terminate()
+        deadline = time.monotonic() + 30
+        for w in workers:
+            if w.process is not None:
+                w.process.join(timeout=max(0.0, deadline - time.monotonic()))
+                if w.process.is_alive():
+                    log.warning("Cluster %d did not stop within 30s; killing it.", w.cluster_id)
+                    w.process.kill()
+                    w.process.join()
+
 # --------------------------------------------------------------------------------------
 # Run
 # --------------------------------------------------------------------------------------
-try:
-    major, minor, *_ = map(int, discord.__version__.split("."))
-    if major < 2:
-        print("[NitroPing] ERROR: discord.py 2.x is required.")
+def main():
+    parser = argparse.ArgumentParser(description="NitroPing Discord bot")
+    parser.add_argument("--migrate-sqlite", action="store_true",
+                        help="import the servers/ JSON tree into SQLITE_PATH and exit")
+    parser.add_argument("--export", metavar="ARCHIVE", type=Path,
+                        help="write every guild config and booster record to a .jsonl.gz archive and exit")
+    parser.add_argument("--import", dest="import_", metavar="ARCHIVE", type=Path,
+                        help="restore an archive written by --export into the configured storage and exit")
+    parser.add_argument("--force-sync", action="store_true",
+                        help="sync app commands with Discord even if the command tree is unchanged")
+    parser.add_argument("--clusters", type=int, default=int(os.getenv("CLUSTERS", "1")),
+                        help="number of worker processes; each owns a range of shards (default 1)")
+    parser.add_argument("--shard-count", type=int, default=SHARD_COUNT,
+                        help="total shards (default: Discord's recommendation)")
+    args = parser.parse_args()
+    setup_logging()
+
+    if args.migrate_sqlite:
+        guilds, boosters, votes = migrate_json_to_sqlite(SERVERS_DIR, SQLITE_PATH)
+        log.info("Migrated %d guild configs, %d booster records and %d live votes into %s", guilds, boosters, votes, SQLITE_PATH)
+        log.info("Set STORAGE_BACKEND=sqlite in .env to use it.")
+        return
+
+    if args.export or args.import_:
+        started = time.perf_counter()
+        if args.export:
+            records = sqlite_records(SQLITE_PATH) if STORAGE_BACKEND == "sqlite" else json_records(SERVERS_DIR)
+            guilds, boosters = export_archive(args.export, records)
+            action, archive = "Exported", args.export
+        else:
+            try:
+                if STORAGE_BACKEND == "sqlite":
+                    guilds, boosters = import_archive_sqlite(args.import_, SQLITE_PATH)
+                else:
+                    guilds, boosters = import_archive_json(args.import_, SERVERS_DIR)
+            except (ValueError, OSError) as e:
+                log.error("Import failed: %s", e)
+                sys.exit(1)
+            action, archive = "Imported", args.import_
+        log.info("%s %d guild configs and %d booster records (%s) in %.1fs.",
+                 action, guilds, boosters, archive, time.perf_counter() - started)
+        return
+
+    if not TOKEN or not TOKEN.strip():
+        log.error("BOT_TOKEN is missing. Looked for .env at %s (exists: %s), working dir %s.",
+                  ENV_PATH, ENV_PATH.exists(), Path.cwd())
         sys.exit(1)
-except Exception:
-    pass
 
-bot.run(TOKEN)
+    try:
+        major, minor, *_ = map(int, discord.__version__.split("."))
+        if major < 2:
+            log.error("discord.py 2.x is required.")
+            sys.exit(1)
+    except Exception:
+        pass
+
+    if args.clusters > 1:
+        run_cluster_launcher(args.clusters, args.shard_count, force_sync=args.force_sync)
+        return
+
+    bot.force_sync = args.force_sync
+    bot.shard_count = args.shard_count
+    startup_profile.mark("init")
+    bot.run(TOKEN, log_handler=None)
+
+if __name__ == "__main__":
+    main()